@@ -1,9 +1,11 @@
-from flask import Flask
+from flask import Flask, jsonify
 from flask_migrate import Migrate
 from flask_jwt_extended import JWTManager
 from flask_cors import CORS
 from dotenv import load_dotenv
 from database import db
+from cache import response_cache
+from json_provider import init_json
 import os
 
 load_dotenv()
@@ -15,8 +17,15 @@ db.init_app(app)
 migrate = Migrate(app, db)
 jwt = JWTManager(app)
 CORS(app)
+response_cache.init_app(app)
+init_json(app)
 
 from models import User, Recipe, Group, Bookmark, Rating, Comment, GroupInvitation
+from search import init_search_index
+from fuzzy import init_fuzzy_index
+from suggest import suggest_index
+from pantry import pantry_index
+from countries import sync_countries
 
 from routes.auth import auth_bp
 from routes.payments import payment_bp
@@ -36,11 +45,21 @@ app.register_blueprint(ratings_bp, url_prefix='/api/ratings')
 app.register_blueprint(bookmarks_bp, url_prefix='/api/bookmarks')
 app.register_blueprint(seed_bp, url_prefix='/api')
 
+@app.route('/api/cache/stats', methods=['GET'])
+def cache_stats():
+    return jsonify(response_cache.stats()), 200
+
 # Auto-initialize database on startup
 with app.app_context():
     try:
         db.create_all()
         print("Database tables created successfully")
+        print(f"Countries in reference table: {sync_countries()}")
+        print(f"Recipe search backend: {init_search_index().name}")
+        fuzzy_backend = init_fuzzy_index()
+        print(f"Fuzzy search backend: {fuzzy_backend.name if fuzzy_backend else 'none'}")
+        print(f"Suggestions indexed: {suggest_index.rebuild()}")
+        print(f"Pantry index recipes: {pantry_index.rebuild()}")
     except Exception as e:
         print(f"Database initialization error: {e}")
 
@@ -0,0 +1,37 @@
+from app import app
+from database import db
+from models import Recipe
+from countries import resolve_country, sync_countries
+from cache import response_cache
+from sqlalchemy import func
+
+def backfill_countries():
+    """Fill the countries reference table and Recipe.country_code for every existing recipe"""
+    with app.app_context():
+        print(f"Countries in reference table: {sync_countries()}")
+
+        # One UPDATE per distinct spelling; there are only as many as people have typed
+        unresolved = []
+        updated = 0
+        spellings = db.session.query(Recipe.country, func.count()).filter(
+            Recipe.country.isnot(None)
+        ).group_by(Recipe.country).all()
+        for country, count in spellings:
+            code = resolve_country(country)
+            if code is None:
+                unresolved.append((country, count))
+            # country_code is in responses, so changed rows get a new version (and ETag)
+            updated += db.session.execute(Recipe.update_quietly(
+                Recipe.country == country, Recipe.country_code.is_distinct_from(code),
+                bump_version=True, country_code=code
+            )).rowcount
+
+        db.session.commit()
+        if not response_cache.invalidate_shared('recipes'):
+            print(f"Cached recipe listings catch up within CACHE_DEFAULT_TIMEOUT ({response_cache.timeout}s)")
+        print(f"Set country_code for {updated} recipes")
+        for country, count in unresolved:
+            print(f"Unrecognised country {country!r} ({count} recipes); add it to countries.py")
+
+if __name__ == '__main__':
+    backfill_countries()
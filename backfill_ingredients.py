@@ -0,0 +1,49 @@
+from app import app
+from database import db
+from models import Recipe, RecipeIngredient, RecipeIngredientWord, ingredient_words
+from ingredients import parse_ingredients
+from diet import classify
+from sqlalchemy import bindparam
+
+BATCH_SIZE = 500
+
+def backfill_ingredients():
+    """Parse Recipe.ingredients into recipe_ingredients, their words and diet_flags for every existing recipe"""
+    with app.app_context():
+        db.session.query(RecipeIngredient).delete(synchronize_session=False)
+        db.session.query(RecipeIngredientWord).delete(synchronize_session=False)
+        
+        total = 0
+        last_id = 0
+        while True:
+            batch = db.session.query(Recipe.id, Recipe.ingredients).filter(
+                Recipe.id > last_id
+            ).order_by(Recipe.id).limit(BATCH_SIZE).all()
+            if not batch:
+                break
+            
+            rows = []
+            words = []
+            flags = []
+            for recipe_id, text in batch:
+                parsed = parse_ingredients(text)
+                for position, item in enumerate(parsed):
+                    rows.append(dict(item, recipe_id=recipe_id, position=position))
+                words.extend({'recipe_id': recipe_id, 'word': word} for word in ingredient_words(item['name'] for item in parsed))
+                flags.append({'recipe_id': recipe_id, 'flags': classify(item['name'] for item in parsed)})
+            if rows:
+                db.session.execute(RecipeIngredient.__table__.insert(), rows)
+            if words:
+                db.session.execute(RecipeIngredientWord.__table__.insert(), words)
+            db.session.execute(
+                Recipe.update_quietly(Recipe.id == bindparam('recipe_id'), diet_flags=bindparam('flags')), flags
+            )
+            
+            total += len(batch)
+            last_id = batch[-1].id
+        
+        db.session.commit()
+        print(f"Parsed ingredients for {total} recipes")
+
+if __name__ == '__main__':
+    backfill_ingredients()
@@ -0,0 +1,82 @@
+"""Time serializing a 1,000-recipe list: ORM to_dict vs row serializers, stdlib json vs orjson.
+
+Runs against a throwaway in-memory SQLite database, never the configured one.
+"""
+import os
+import statistics
+import time
+
+os.environ['DATABASE_URL'] = 'sqlite://'
+
+from datetime import datetime, timedelta
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy.orm import joinedload
+from app import app
+from database import db
+from models import User, Recipe
+from json_provider import OrjsonProvider, orjson
+from serializers import recipe_serializer
+
+RECIPES = 1000
+ROUNDS = 20
+
+def seed():
+    user = User(username='bench', email='bench@example.com', password_hash='x')
+    db.session.add(user)
+    db.session.flush()
+    start = datetime(2024, 1, 1)
+    db.session.execute(Recipe.__table__.insert(), [{
+        'title': f'Recipe {i}',
+        'description': 'A weeknight dish with a short description. ' * 4,
+        'ingredients': '\n'.join(f'{n} cups ingredient {n}' for n in range(1, 12)),
+        'instructions': 'Chop, stir and simmer until done. ' * 20,
+        'prep_time': 10 + i % 30,
+        'cook_time': 20 + i % 60,
+        'servings': 1 + i % 8,
+        'country': 'Kenya',
+        'is_premium': False,
+        'user_id': user.id,
+        'created_at': start + timedelta(minutes=i),
+        'rating_sum': i % 23,
+        'rating_count': i % 5,
+        'comment_count': i % 7,
+    } for i in range(RECIPES)])
+    db.session.commit()
+
+def orm_dicts():
+    recipes = Recipe.query.options(joinedload(Recipe.user)).order_by(Recipe.created_at.desc(), Recipe.id.desc()).all()
+    data = [recipe.to_dict(include_stats=True) for recipe in recipes]
+    db.session.expunge_all()
+    return data
+
+def row_dicts():
+    serializer = recipe_serializer()
+    rows = serializer.query().order_by(Recipe.created_at.desc(), Recipe.id.desc()).all()
+    return serializer.many(rows)
+
+def measure(label, build, provider):
+    timings = []
+    for _ in range(ROUNDS):
+        started = time.perf_counter()
+        provider.response(build()).get_data()
+        timings.append((time.perf_counter() - started) * 1000)
+    print(f"{label:<32} median {statistics.median(timings):7.2f} ms   min {min(timings):7.2f} ms")
+
+def bench():
+    with app.app_context():
+        seed()
+        assert orm_dicts() == row_dicts(), 'row serializer output differs from to_dict'
+
+        stdlib = DefaultJSONProvider(app)
+        print(f"{RECIPES} recipes, {ROUNDS} rounds (query + serialize + encode)")
+        measure('to_dict + stdlib json', orm_dicts, stdlib)
+        measure('row serializer + stdlib json', row_dicts, stdlib)
+        if orjson is None:
+            print("orjson not installed; skipping orjson timings")
+            return
+        fast = OrjsonProvider(app)
+        measure('to_dict + orjson', orm_dicts, fast)
+        measure('row serializer + orjson', row_dicts, fast)
+
+if __name__ == '__main__':
+    bench()
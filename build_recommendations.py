@@ -0,0 +1,18 @@
+import sys
+from app import app
+from recommendations import rebuild_collaborative, refresh_collaborative, rebuild_content
+
+def build_recommendations(refresh=False):
+    """Recompute "also liked" and content neighbours; --refresh only updates "also liked" for recipes with new activity"""
+    with app.app_context():
+        if refresh:
+            refreshed = refresh_collaborative()
+            print(f"Refreshed recommendations for {refreshed} recipes")
+        else:
+            stored = rebuild_collaborative()
+            print(f"Stored {stored} rating/bookmark neighbours")
+            stored = rebuild_content()
+            print(f"Stored {stored} content neighbours")
+
+if __name__ == '__main__':
+    build_recommendations(refresh='--refresh' in sys.argv[1:])
@@ -0,0 +1,255 @@
+"""Response cache for public, read-heavy GET endpoints.
+
+Views opt in with ``@response_cache.cached(tags=...)`` and write handlers
+call ``response_cache.invalidate(...)`` with the tags they touched, e.g.
+``'recipes'`` for anything shown in recipe listings and ``'recipe:<id>'``
+for one recipe. The default backend is an in-process LRU; set
+``CACHE_BACKEND=redis`` (and ``CACHE_REDIS_URL``) to share entries and
+invalidations between workers. Entries also expire after
+``CACHE_DEFAULT_TIMEOUT`` seconds, which bounds staleness for per-process
+caches when another worker handles the write.
+"""
+import json
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from flask import request, Response, g
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+class LRUBackend:
+    name = 'lru'
+
+    def __init__(self, max_entries=2048, max_bytes=64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (expires_at, value, tags)
+        self._tags = {}                # tag -> set of keys
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value, tags, timeout):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + timeout, value, tags)
+            self._bytes += len(key) + len(value)
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, tags):
+        with self._lock:
+            for tag in tags:
+                for key in self._tags.pop(tag, ()):
+                    self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+            self._bytes = 0
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self._bytes -= len(key) + len(entry[1])
+        for tag in entry[2]:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def stats(self):
+        return {'entries': len(self._entries), 'memory_bytes': self._bytes, 'max_bytes': self.max_bytes}
+
+class RedisBackend:
+    name = 'redis'
+
+    def __init__(self, url, prefix='recipe-room:cache:'):
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key):
+        return self.client.get(self.prefix + key)
+
+    def set(self, key, value, tags, timeout):
+        pipe = self.client.pipeline()
+        pipe.set(self.prefix + key, value, ex=timeout)
+        for tag in tags:
+            tag_key = self.prefix + 'tag:' + tag
+            pipe.sadd(tag_key, key)
+            pipe.expire(tag_key, timeout)
+        pipe.execute()
+
+    def invalidate(self, tags):
+        for tag in tags:
+            tag_key = self.prefix + 'tag:' + tag
+            keys = self.client.smembers(tag_key)
+            pipe = self.client.pipeline()
+            for key in keys:
+                pipe.delete(self.prefix + key.decode())
+            pipe.delete(tag_key)
+            pipe.execute()
+
+    def clear(self):
+        keys = list(self.client.scan_iter(self.prefix + '*'))
+        if keys:
+            self.client.delete(*keys)
+
+    def stats(self):
+        return {'memory_bytes': self.client.info('memory').get('used_memory')}
+
+# Headers a view sets itself that are part of the cached response
+_STORED_HEADERS = ('X-Next-Cursor',)
+
+def _pack(response):
+    headers = {name: response.headers[name] for name in _STORED_HEADERS if name in response.headers}
+    meta = json.dumps({'status': response.status_code, 'mimetype': response.mimetype, 'headers': headers}).encode()
+    return meta + b'\n' + response.get_data()
+
+def _unpack(value):
+    meta, body = value.split(b'\n', 1)
+    meta = json.loads(meta)
+    return Response(body, status=meta['status'], mimetype=meta['mimetype'], headers=meta.get('headers'))
+
+class ResponseCache:
+    def __init__(self):
+        self.backend = None
+        self.timeout = 60
+        self.hits = 0
+        self.misses = 0
+
+    def init_app(self, app):
+        backend = app.config.get('CACHE_BACKEND', 'lru')
+        self.timeout = app.config.get('CACHE_DEFAULT_TIMEOUT', 60)
+        if backend == 'redis':
+            if redis is None:
+                raise RuntimeError("CACHE_BACKEND=redis needs the 'redis' package installed")
+            self.backend = RedisBackend(app.config['CACHE_REDIS_URL'])
+        elif backend == 'none':
+            self.backend = None
+        else:
+            self.backend = LRUBackend(
+                max_entries=app.config.get('CACHE_MAX_ENTRIES', 2048),
+                max_bytes=app.config.get('CACHE_MAX_BYTES', 64 * 1024 * 1024)
+            )
+
+    @staticmethod
+    def make_key():
+        # Parameter order and repeated empty values shouldn't split the cache
+        args = sorted((k, v) for k, values in request.args.lists() for v in values if v != '')
+        key = request.path + '?' + '&'.join(f'{k}={v}' for k, v in args)
+        # Under utils.conditional the current version is part of the key, so a
+        # stale entry another worker never invalidated can't go out with a new ETag
+        etag = g.get('etag')
+        return f'{key}#{etag}' if etag else key
+
+    def cached(self, tags, timeout=None):
+        """Cache successful responses of a view; tags(**view_args) names what invalidates them"""
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                # Responses for a signed-in viewer carry per-user fields
+                if self.backend is None or request.headers.get('Authorization'):
+                    return view(*args, **kwargs)
+
+                key = self.make_key()
+                try:
+                    value = self.backend.get(key)
+                except Exception:
+                    value = None
+                if value is not None:
+                    self.hits += 1
+                    response = _unpack(value)
+                    response.headers['X-Cache'] = 'HIT'
+                    return response
+
+                self.misses += 1
+                rv = view(*args, **kwargs)
+                response, status = (rv if isinstance(rv, tuple) else (rv, None))
+                if status is not None:
+                    response.status_code = status
+                # Streamed bodies would have to be buffered whole to be cached
+                if response.status_code == 200 and not response.is_streamed:
+                    entry_tags = tags(**kwargs) if callable(tags) else tags
+                    try:
+                        self.backend.set(key, _pack(response), list(entry_tags), timeout or self.timeout)
+                    except Exception:
+                        pass
+                response.headers['X-Cache'] = 'MISS'
+                return response
+            return wrapper
+        return decorator
+
+    def memoize(self, key, tags, compute, timeout=None):
+        """compute()'s JSON-serializable result, cached under key until one of tags is invalidated"""
+        if self.backend is None:
+            return compute()
+        try:
+            value = self.backend.get(key)
+        except Exception:
+            value = None
+        if value is not None:
+            self.hits += 1
+            return json.loads(value)
+        
+        self.misses += 1
+        result = compute()
+        try:
+            self.backend.set(key, json.dumps(result).encode(), list(tags), timeout or self.timeout)
+        except Exception:
+            pass
+        return result
+
+    def invalidate(self, *tags):
+        if self.backend is not None:
+            self.backend.invalidate(tags)
+
+    def invalidate_shared(self, *tags):
+        """invalidate() from outside the web workers, e.g. a bulk script; returns whether it reached them.
+
+        Only the redis backend is shared. With a per-process LRU the script's
+        cache is its own, so the workers keep their entries until they expire
+        after CACHE_DEFAULT_TIMEOUT.
+        """
+        if self.backend is None or self.backend.name != 'redis':
+            return False
+        self.backend.invalidate(tags)
+        return True
+
+    def clear(self):
+        if self.backend is not None:
+            self.backend.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        data = {
+            'backend': self.backend.name if self.backend else 'none',
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0
+        }
+        if self.backend is not None:
+            data.update(self.backend.stats())
+        return data
+
+response_cache = ResponseCache()
@@ -0,0 +1,171 @@
+"""Content-based "similar recipes" from TF-IDF over title, description and ingredients.
+
+Each recipe keeps its ``MAX_TERMS`` strongest TF-IDF terms, scaled to unit
+length, in ``recipe_terms``; ``content_terms`` holds how many recipes use each
+term. Together they form an inverted index: the neighbours of a recipe are
+the recipes sharing its terms, scored by dot product (cosine) in one grouped
+query over ``ix_recipe_terms_term``, and the best ``TOP_K`` are stored in
+``recipe_similarities`` with ``source='content'``.
+
+``build_recommendations.py`` recomputes every vector and neighbour list
+offline (see ``recommendations.rebuild_content``). Between runs the recipe
+write routes call ``index_recipe`` / ``unindex_recipe`` so a new or edited
+recipe gets neighbours immediately without touching the rest of the matrix.
+"""
+import math
+import re
+from collections import Counter
+from sqlalchemy import select, func, case, or_
+from database import db
+from ingredients import singular, DESCRIPTORS, UNITS
+from models import Recipe, RecipeSimilarity, RecipeTerm, ContentTerm
+
+MAX_TERMS = 32
+TOP_K = 20
+MIN_SCORE = 0.01
+MAX_DF_RATIO = 0.05
+CANDIDATES = 500
+
+# Title words say most about what a dish is, then what goes in it
+FIELD_WEIGHTS = (('title', 3), ('ingredients', 2), ('description', 1))
+
+STOPWORDS = {
+    'and', 'the', 'with', 'for', 'from', 'into', 'onto', 'this', 'that', 'your', 'you',
+    'are', 'was', 'its', 'our', 'all', 'any', 'but', 'not', 'out', 'off', 'over', 'then',
+    'until', 'about', 'each', 'some', 'more', 'most', 'very', 'just', 'also', 'make',
+    'made', 'serve', 'served', 'recipe', 'dish', 'taste', 'style', 'traditional', 'delicious',
+    'easy', 'quick', 'perfect', 'favourite', 'favorite', 'classic', 'homemade',
+}
+_WORD = re.compile(r"[^\W\d_]{3,}")
+
+def term_counts(title, description, ingredients):
+    """Field-weighted counts of the terms in a recipe's text"""
+    fields = {'title': title, 'description': description, 'ingredients': ingredients}
+    counts = Counter()
+    for field, weight in FIELD_WEIGHTS:
+        for word in _WORD.findall((fields[field] or '').lower()):
+            if word in STOPWORDS or word in DESCRIPTORS or word in UNITS:
+                continue
+            counts[singular(word)[:50]] += weight
+    return counts
+
+def recipe_term_counts(recipe):
+    return term_counts(recipe.title, recipe.description, recipe.ingredients)
+
+def idf(doc_count, total):
+    # Smoothed so a term in every recipe still weighs a little
+    return math.log((1 + total) / (1 + doc_count)) + 1
+
+def term_vector(counts, doc_counts, total):
+    """The MAX_TERMS heaviest TF-IDF weights of counts, scaled to unit length, as {term: weight}"""
+    weights = {
+        term: (1 + math.log(count)) * idf(doc_counts.get(term, 0), total)
+        for term, count in counts.items()
+    }
+    top = sorted(weights.items(), key=lambda item: (-item[1], item[0]))[:MAX_TERMS]
+    norm = math.sqrt(sum(weight * weight for _, weight in top)) or 1
+    return {term: weight / norm for term, weight in top}
+
+def _adjust_doc_counts(added, removed):
+    if removed:
+        db.session.query(ContentTerm).filter(ContentTerm.term.in_(removed)).update(
+            {ContentTerm.doc_count: ContentTerm.doc_count - 1}, synchronize_session=False
+        )
+    if added:
+        existing = {term for term, in db.session.query(ContentTerm.term).filter(ContentTerm.term.in_(added))}
+        if existing:
+            db.session.query(ContentTerm).filter(ContentTerm.term.in_(existing)).update(
+                {ContentTerm.doc_count: ContentTerm.doc_count + 1}, synchronize_session=False
+            )
+        missing = [{'term': term, 'doc_count': 1} for term in added if term not in existing]
+        if missing:
+            db.session.execute(ContentTerm.__table__.insert(), missing)
+
+def nearest(vector, doc_counts, total, exclude_id=None, limit=TOP_K):
+    """[(recipe_id, score)] of the stored vectors closest to vector, best first.
+
+    Walking the postings of a term like "onion" would touch a large share of
+    the catalogue, so candidates come from the vector's distinctive terms (used
+    by at most MAX_DF_RATIO of recipes, or else its rarest term) and only the
+    best CANDIDATES of those are scored against the whole vector.
+    """
+    if not vector:
+        return []
+    # A term with no more postings than CANDIDATES is cheap to walk however common it is
+    cutoff = max(MAX_DF_RATIO * total, CANDIDATES)
+    distinctive = [term for term in vector if doc_counts.get(term, 0) <= cutoff]
+    if not distinctive:
+        distinctive = [min(vector, key=lambda term: doc_counts.get(term, 0))]
+    weight = RecipeTerm.weight * case(vector, value=RecipeTerm.term, else_=0.0)
+
+    candidates = select(RecipeTerm.recipe_id).where(RecipeTerm.term.in_(distinctive))
+    if exclude_id is not None:
+        candidates = candidates.where(RecipeTerm.recipe_id != exclude_id)
+    candidates = candidates.group_by(RecipeTerm.recipe_id).order_by(func.sum(weight).desc()).limit(CANDIDATES)
+
+    score = func.sum(weight)
+    return db.session.query(RecipeTerm.recipe_id, score.label('score')).filter(
+        RecipeTerm.recipe_id.in_(candidates), RecipeTerm.term.in_(list(vector))
+    ).group_by(RecipeTerm.recipe_id).having(score >= MIN_SCORE).order_by(
+        score.desc(), RecipeTerm.recipe_id
+    ).limit(limit).all()
+
+def index_recipe(recipe, previous=None):
+    """Store the TF-IDF vector and content neighbours of one recipe.
+
+    Call after the recipe has an id (flush first) and before commit. previous
+    is recipe_term_counts() from before an edit, None for a new recipe. The
+    recipe is also offered to each of its neighbours' lists, which are then
+    trimmed back to TOP_K; other recipes' vectors are left as they are until
+    the next offline rebuild.
+    """
+    counts = recipe_term_counts(recipe)
+    _adjust_doc_counts(set(counts) - set(previous or ()), set(previous or ()) - set(counts))
+
+    doc_counts = dict(db.session.query(ContentTerm.term, ContentTerm.doc_count).filter(ContentTerm.term.in_(list(counts))))
+    total = db.session.query(func.count(Recipe.id)).scalar()
+    vector = term_vector(counts, doc_counts, total)
+
+    db.session.query(RecipeTerm).filter(RecipeTerm.recipe_id == recipe.id).delete(synchronize_session=False)
+    if vector:
+        db.session.execute(RecipeTerm.__table__.insert(), [
+            {'recipe_id': recipe.id, 'term': term, 'weight': weight} for term, weight in vector.items()
+        ])
+
+    neighbours = nearest(vector, doc_counts, total, exclude_id=recipe.id)
+    _forget_neighbours(recipe.id, 'content')
+    if not neighbours:
+        return
+    rows = []
+    for neighbour_id, score in neighbours:
+        rows.append({'recipe_id': recipe.id, 'similar_recipe_id': neighbour_id, 'score': score, 'source': 'content'})
+        rows.append({'recipe_id': neighbour_id, 'similar_recipe_id': recipe.id, 'score': score, 'source': 'content'})
+    db.session.execute(RecipeSimilarity.__table__.insert(), rows)
+    _trim([neighbour_id for neighbour_id, _ in neighbours], 'content')
+
+def unindex_recipe(recipe):
+    """Drop a recipe's vector and every stored neighbour pair involving it; call before deleting it"""
+    _adjust_doc_counts(set(), set(recipe_term_counts(recipe)))
+    db.session.query(RecipeTerm).filter(RecipeTerm.recipe_id == recipe.id).delete(synchronize_session=False)
+    _forget_neighbours(recipe.id)
+
+def _forget_neighbours(recipe_id, source=None):
+    query = db.session.query(RecipeSimilarity).filter(
+        or_(RecipeSimilarity.recipe_id == recipe_id, RecipeSimilarity.similar_recipe_id == recipe_id)
+    )
+    if source is not None:
+        query = query.filter(RecipeSimilarity.source == source)
+    query.delete(synchronize_session=False)
+
+def _trim(recipe_ids, source):
+    """Delete all but the TOP_K best stored neighbours of each of recipe_ids"""
+    ranked = select(
+        RecipeSimilarity.id,
+        func.row_number().over(
+            partition_by=RecipeSimilarity.recipe_id,
+            order_by=(RecipeSimilarity.score.desc(), RecipeSimilarity.similar_recipe_id)
+        ).label('rank')
+    ).where(RecipeSimilarity.source == source, RecipeSimilarity.recipe_id.in_(recipe_ids)).subquery()
+    db.session.query(RecipeSimilarity).filter(
+        RecipeSimilarity.id.in_(select(ranked.c.id).where(ranked.c.rank > TOP_K))
+    ).delete(synchronize_session=False)
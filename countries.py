@@ -0,0 +1,94 @@
+"""Country reference data: ISO 3166-1 alpha-2 codes, names and aliases.
+
+``Recipe.country`` stays the free text the author typed; ``Recipe.country_code``
+is that text resolved here ("Ivory Coast", "Côte d'Ivoire" and "CI" are all
+``CI``) and is what filters and facet counts use. Matching ignores case,
+accents and punctuation and happens in memory; ``sync_countries()`` only
+mirrors the codes and names into the ``countries`` table the foreign key
+points at.
+"""
+import re
+import unicodedata
+
+# (code, name, *aliases)
+COUNTRIES = [
+    ('AF', 'Afghanistan'), ('AL', 'Albania'), ('DZ', 'Algeria'), ('AD', 'Andorra'), ('AO', 'Angola'),
+    ('AG', 'Antigua and Barbuda'), ('AR', 'Argentina'), ('AM', 'Armenia'), ('AU', 'Australia'),
+    ('AT', 'Austria'), ('AZ', 'Azerbaijan'), ('BS', 'Bahamas', 'The Bahamas'), ('BH', 'Bahrain'),
+    ('BD', 'Bangladesh'), ('BB', 'Barbados'), ('BY', 'Belarus'), ('BE', 'Belgium'), ('BZ', 'Belize'),
+    ('BJ', 'Benin'), ('BT', 'Bhutan'), ('BO', 'Bolivia'), ('BA', 'Bosnia and Herzegovina', 'Bosnia'),
+    ('BW', 'Botswana'), ('BR', 'Brazil', 'Brasil'), ('BN', 'Brunei'), ('BG', 'Bulgaria'),
+    ('BF', 'Burkina Faso'), ('BI', 'Burundi'), ('CV', 'Cabo Verde', 'Cape Verde'), ('KH', 'Cambodia'),
+    ('CM', 'Cameroon'), ('CA', 'Canada'), ('CF', 'Central African Republic'), ('TD', 'Chad'),
+    ('CL', 'Chile'), ('CN', 'China', "People's Republic of China", 'PRC'), ('CO', 'Colombia'),
+    ('KM', 'Comoros'), ('CG', 'Congo', 'Republic of the Congo', 'Congo-Brazzaville'),
+    ('CD', 'Democratic Republic of the Congo', 'DR Congo', 'DRC', 'Congo-Kinshasa'),
+    ('CR', 'Costa Rica'), ('CI', "Côte d'Ivoire", 'Ivory Coast', 'Cote dIvoire'), ('HR', 'Croatia'),
+    ('CU', 'Cuba'), ('CY', 'Cyprus'), ('CZ', 'Czechia', 'Czech Republic'), ('DK', 'Denmark'),
+    ('DJ', 'Djibouti'), ('DM', 'Dominica'), ('DO', 'Dominican Republic'), ('EC', 'Ecuador'),
+    ('EG', 'Egypt'), ('SV', 'El Salvador'), ('GQ', 'Equatorial Guinea'), ('ER', 'Eritrea'),
+    ('EE', 'Estonia'), ('SZ', 'Eswatini', 'Swaziland'), ('ET', 'Ethiopia'), ('FJ', 'Fiji'),
+    ('FI', 'Finland'), ('FR', 'France'), ('GA', 'Gabon'), ('GM', 'Gambia', 'The Gambia'), ('GE', 'Georgia'),
+    ('DE', 'Germany', 'Deutschland'), ('GH', 'Ghana'), ('GR', 'Greece'), ('GD', 'Grenada'),
+    ('GT', 'Guatemala'), ('GN', 'Guinea'), ('GW', 'Guinea-Bissau'), ('GY', 'Guyana'), ('HT', 'Haiti'),
+    ('HN', 'Honduras'), ('HK', 'Hong Kong'), ('HU', 'Hungary'), ('IS', 'Iceland'), ('IN', 'India'),
+    ('ID', 'Indonesia'), ('IR', 'Iran', 'Persia'), ('IQ', 'Iraq'), ('IE', 'Ireland'), ('IL', 'Israel'),
+    ('IT', 'Italy', 'Italia'), ('JM', 'Jamaica'), ('JP', 'Japan'), ('JO', 'Jordan'), ('KZ', 'Kazakhstan'),
+    ('KE', 'Kenya'), ('KI', 'Kiribati'), ('KP', 'North Korea', 'DPRK'), ('KR', 'South Korea', 'Korea', 'Republic of Korea'),
+    ('KW', 'Kuwait'), ('KG', 'Kyrgyzstan'), ('LA', 'Laos'), ('LV', 'Latvia'), ('LB', 'Lebanon'),
+    ('LS', 'Lesotho'), ('LR', 'Liberia'), ('LY', 'Libya'), ('LI', 'Liechtenstein'), ('LT', 'Lithuania'),
+    ('LU', 'Luxembourg'), ('MG', 'Madagascar'), ('MW', 'Malawi'), ('MY', 'Malaysia'), ('MV', 'Maldives'),
+    ('ML', 'Mali'), ('MT', 'Malta'), ('MH', 'Marshall Islands'), ('MR', 'Mauritania'), ('MU', 'Mauritius'),
+    ('MX', 'Mexico', 'México'), ('FM', 'Micronesia'), ('MD', 'Moldova'), ('MC', 'Monaco'), ('MN', 'Mongolia'),
+    ('ME', 'Montenegro'), ('MA', 'Morocco'), ('MZ', 'Mozambique'), ('MM', 'Myanmar', 'Burma'),
+    ('NA', 'Namibia'), ('NR', 'Nauru'), ('NP', 'Nepal'), ('NL', 'Netherlands', 'Holland'),
+    ('NZ', 'New Zealand'), ('NI', 'Nicaragua'), ('NE', 'Niger'), ('NG', 'Nigeria'),
+    ('MK', 'North Macedonia', 'Macedonia'), ('NO', 'Norway'), ('OM', 'Oman'), ('PK', 'Pakistan'),
+    ('PW', 'Palau'), ('PS', 'Palestine'), ('PA', 'Panama'), ('PG', 'Papua New Guinea'), ('PY', 'Paraguay'),
+    ('PE', 'Peru'), ('PH', 'Philippines'), ('PL', 'Poland', 'Polska'), ('PT', 'Portugal'),
+    ('PR', 'Puerto Rico'), ('QA', 'Qatar'), ('RO', 'Romania'), ('RU', 'Russia', 'Russian Federation'),
+    ('RW', 'Rwanda'), ('KN', 'Saint Kitts and Nevis'), ('LC', 'Saint Lucia'),
+    ('VC', 'Saint Vincent and the Grenadines'), ('WS', 'Samoa'), ('SM', 'San Marino'),
+    ('ST', 'Sao Tome and Principe'), ('SA', 'Saudi Arabia'), ('SN', 'Senegal'), ('RS', 'Serbia'),
+    ('SC', 'Seychelles'), ('SL', 'Sierra Leone'), ('SG', 'Singapore'), ('SK', 'Slovakia'),
+    ('SI', 'Slovenia'), ('SB', 'Solomon Islands'), ('SO', 'Somalia'), ('ZA', 'South Africa'),
+    ('SS', 'South Sudan'), ('ES', 'Spain', 'España'), ('LK', 'Sri Lanka', 'Ceylon'), ('SD', 'Sudan'),
+    ('SR', 'Suriname'), ('SE', 'Sweden'), ('CH', 'Switzerland'), ('SY', 'Syria'), ('TW', 'Taiwan'),
+    ('TJ', 'Tajikistan'), ('TZ', 'Tanzania'), ('TH', 'Thailand', 'Siam'), ('TL', 'Timor-Leste', 'East Timor'),
+    ('TG', 'Togo'), ('TO', 'Tonga'), ('TT', 'Trinidad and Tobago', 'Trinidad'), ('TN', 'Tunisia'),
+    ('TR', 'Turkey', 'Türkiye'), ('TM', 'Turkmenistan'), ('TV', 'Tuvalu'), ('UG', 'Uganda'),
+    ('UA', 'Ukraine'), ('AE', 'United Arab Emirates', 'UAE'),
+    ('GB', 'United Kingdom', 'UK', 'Great Britain', 'Britain', 'England', 'Scotland', 'Wales'),
+    ('US', 'United States', 'USA', 'United States of America', 'America'), ('UY', 'Uruguay'),
+    ('UZ', 'Uzbekistan'), ('VU', 'Vanuatu'), ('VE', 'Venezuela'), ('VN', 'Vietnam', 'Viet Nam'),
+    ('YE', 'Yemen'), ('ZM', 'Zambia'), ('ZW', 'Zimbabwe'),
+]
+
+_NON_ALNUM = re.compile(r'[^a-z0-9]+')
+
+def normalize(value):
+    """Lower-cased, accent- and punctuation-free form that names and aliases are matched in"""
+    value = unicodedata.normalize('NFKD', value or '')
+    value = ''.join(ch for ch in value if not unicodedata.combining(ch))
+    return _NON_ALNUM.sub(' ', value.lower().replace("'", '')).strip()
+
+COUNTRY_NAMES = {code: name for code, name, *_ in COUNTRIES}
+_ALIASES = {}
+for _code, *_names in COUNTRIES:
+    for _name in [_code, *_names]:
+        _ALIASES[normalize(_name)] = _code
+
+def resolve_country(value):
+    """ISO code for a country name, alias or code, or None if it isn't recognised"""
+    if not value:
+        return None
+    return _ALIASES.get(normalize(value))
+
+def sync_countries():
+    """Insert any country missing from the reference table; call inside an app context"""
+    from database import db
+    from models import Country
+    known = {code for code, in db.session.query(Country.code)}
+    db.session.add_all(Country(code=code, name=name) for code, name in COUNTRY_NAMES.items() if code not in known)
+    db.session.commit()
+    return len(COUNTRY_NAMES)
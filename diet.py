@@ -0,0 +1,136 @@
+"""Diet and allergen flags derived from parsed ingredient names.
+
+``Recipe.diet_flags`` has one bit per thing a recipe *contains* (meat,
+dairy, gluten, peanut, ...), set whenever the ingredient text is (see
+``sync_ingredient_items`` in models.py). A diet is the set of bits it rules
+out, so "vegan and no sesame" is the single predicate
+``diet_flags & (VEGAN | SESAME) = 0``. A B-tree index can't answer that, so
+the column is deliberately unindexed: the test is a cheap check on rows the
+other filters and the sort order's index already pick.
+
+Classification is by keyword on the canonical names: whole phrases first
+("coconut milk" is not dairy, "soy sauce" is soy and gluten), then single
+words, less whatever a "gluten-free" or "vegan" label rules out.
+Ingredients it doesn't recognise add no flags.
+"""
+MEAT = 1 << 0
+POULTRY = 1 << 1
+FISH = 1 << 2
+SHELLFISH = 1 << 3
+DAIRY = 1 << 4
+EGG = 1 << 5
+GLUTEN = 1 << 6
+PEANUT = 1 << 7
+TREE_NUT = 1 << 8
+SOY = 1 << 9
+SESAME = 1 << 10
+HONEY = 1 << 11
+PORK = 1 << 12
+ALCOHOL = 1 << 13
+
+# exclude= names
+CONTAINS = {
+    'meat': MEAT, 'poultry': POULTRY, 'fish': FISH, 'shellfish': SHELLFISH, 'dairy': DAIRY,
+    'egg': EGG, 'gluten': GLUTEN, 'peanut': PEANUT, 'tree-nut': TREE_NUT, 'nut': PEANUT | TREE_NUT,
+    'soy': SOY, 'sesame': SESAME, 'honey': HONEY, 'pork': PORK, 'alcohol': ALCOHOL,
+}
+
+# diet= names, as the flags a recipe must not have
+VEGETARIAN = MEAT | POULTRY | FISH | SHELLFISH
+DIETS = {
+    'vegetarian': VEGETARIAN,
+    'vegan': VEGETARIAN | DAIRY | EGG | HONEY,
+    'pescatarian': MEAT | POULTRY,
+    'gluten-free': GLUTEN,
+    'dairy-free': DAIRY,
+    'egg-free': EGG,
+    'nut-free': PEANUT | TREE_NUT,
+    'halal': PORK | ALCOHOL,
+}
+
+PHRASES = {
+    'coconut milk': 0, 'coconut cream': 0, 'almond milk': TREE_NUT, 'oat milk': 0, 'soy milk': SOY,
+    'peanut butter': PEANUT, 'almond butter': TREE_NUT, 'cocoa butter': 0, 'cream of tartar': 0,
+    'rice noodle': 0, 'rice flour': 0, 'corn flour': 0, 'almond flour': TREE_NUT, 'chickpea flour': 0,
+    'coconut flour': 0, 'buckwheat flour': 0, 'corn tortilla': 0,
+    'soy sauce': SOY | GLUTEN, 'fish sauce': FISH, 'oyster sauce': SHELLFISH, 'worcestershire sauce': FISH,
+    'sesame oil': SESAME, 'goat cheese': DAIRY, 'goat milk': DAIRY, 'egg replacer': 0, 'nutritional yeast': 0,
+}
+
+# Words that label a product as made without something: "gluten-free pasta", "vegan cheese"
+FREE_FROM = {
+    'gluten-free': GLUTEN, 'dairy-free': DAIRY, 'egg-free': EGG, 'nut-free': PEANUT | TREE_NUT,
+    'vegetarian': VEGETARIAN, 'vegan': VEGETARIAN | DAIRY | EGG | HONEY, 'plant-based': VEGETARIAN | DAIRY | EGG,
+}
+
+WORDS = {
+    MEAT: {
+        'beef', 'lamb', 'mutton', 'goat', 'veal', 'venison', 'steak', 'mince', 'oxtail', 'brisket',
+        'gelatin', 'gelatine', 'suet', 'lard', 'tripe', 'liver', 'meatball', 'meat',
+    },
+    PORK | MEAT: {'pork', 'bacon', 'ham', 'sausage', 'chorizo', 'salami', 'pepperoni', 'prosciutto', 'pancetta'},
+    POULTRY: {'chicken', 'turkey', 'duck', 'goose', 'quail'},
+    FISH: {
+        'fish', 'salmon', 'tuna', 'cod', 'tilapia', 'anchovy', 'sardine', 'mackerel', 'trout', 'haddock',
+        'halibut', 'snapper', 'catfish', 'herring', 'bonito', 'dashi',
+    },
+    SHELLFISH: {
+        'shrimp', 'prawn', 'crab', 'lobster', 'mussel', 'clam', 'oyster', 'scallop', 'squid', 'calamari',
+        'octopus', 'crayfish',
+    },
+    DAIRY: {
+        'milk', 'butter', 'cheese', 'cream', 'yogurt', 'yoghurt', 'ghee', 'paneer', 'parmesan', 'mozzarella',
+        'feta', 'cheddar', 'ricotta', 'buttermilk', 'mascarpone', 'halloumi', 'custard', 'whey',
+    },
+    EGG: {'egg', 'mayonnaise', 'mayo', 'meringue'},
+    GLUTEN: {
+        'flour', 'wheat', 'bread', 'breadcrumb', 'pasta', 'spaghetti', 'macaroni', 'penne', 'fettuccine',
+        'lasagna', 'noodle', 'couscous', 'barley', 'rye', 'semolina', 'bulgur', 'seitan', 'tortilla',
+        'pita', 'naan', 'chapati', 'biscuit', 'cracker', 'panko', 'pastry', 'dough', 'beer', 'udon',
+    },
+    PEANUT: {'peanut', 'groundnut'},
+    TREE_NUT: {'almond', 'cashew', 'walnut', 'pecan', 'pistachio', 'hazelnut', 'macadamia', 'pine', 'nut'},
+    SOY: {'soy', 'soya', 'tofu', 'edamame', 'tempeh', 'miso'},
+    SESAME: {'sesame', 'tahini'},
+    HONEY: {'honey'},
+    ALCOHOL: {'wine', 'beer', 'rum', 'vodka', 'brandy', 'whisky', 'whiskey', 'sake', 'mirin', 'liqueur', 'bourbon'},
+}
+_WORD_FLAGS = {}
+for _flags, _words in WORDS.items():
+    for _word in _words:
+        _WORD_FLAGS[_word] = _WORD_FLAGS.get(_word, 0) | _flags
+
+def name_flags(name):
+    """Flags for one canonical ingredient name"""
+    flags = 0
+    text = f' {name} '
+    for phrase, phrase_flags in PHRASES.items():
+        if f' {phrase} ' in text:
+            flags |= phrase_flags
+            text = text.replace(f' {phrase} ', ' ')
+    words = text.split()
+    for word in words:
+        flags |= _WORD_FLAGS.get(word, 0)
+    for word in words:
+        flags &= ~FREE_FROM.get(word, 0)
+    return flags
+
+def classify(names):
+    """Recipe.diet_flags for a recipe's canonical ingredient names"""
+    flags = 0
+    for name in names:
+        flags |= name_flags(name)
+    return flags
+
+def excluded_flags(diets=(), excludes=()):
+    """The flags a recipe must not have to suit every diet and avoid every exclusion; ValueError on unknown names"""
+    mask = 0
+    for diet in diets:
+        if diet not in DIETS:
+            raise ValueError(f"Unknown diet {diet!r}; expected one of {', '.join(sorted(DIETS))}")
+        mask |= DIETS[diet]
+    for item in excludes:
+        if item not in CONTAINS:
+            raise ValueError(f"Unknown exclusion {item!r}; expected one of {', '.join(sorted(CONTAINS))}")
+        mask |= CONTAINS[item]
+    return mask
@@ -0,0 +1,84 @@
+"""Facet counts for a filtered recipe listing, in one grouped query.
+
+Every recipe is reduced to four small values (its country code, diet flags,
+the first time bucket its total time fits and its rounded average rating)
+and counted once per value of each. Postgres does that with
+``GROUP BY GROUPING SETS``; elsewhere a ``UNION ALL`` of four ``GROUP BY``s
+over a materialized CTE of the filtered rows does the same in one statement.
+
+Diets, time buckets and rating bands are folded up in Python so every count
+is exactly what adding that filter would return: the ``vegan`` count is the
+recipes whose flags allow it, the ``max_total_time=30`` count includes the
+quick ones, and the ``min_rating=4`` count is the recipes rounding to 4.0+.
+"""
+from sqlalchemy import select, func, case, cast, literal, union_all, Numeric
+from database import db
+from models import Recipe
+from diet import DIETS
+from countries import COUNTRY_NAMES
+
+TIME_BUCKETS = (15, 30, 60, 120)
+RATING_BANDS = (4, 3, 2, 1)
+FACETS = ('country', 'diet', 'total_time', 'rating')
+
+def _columns():
+    # min_rating compares the same rounded average; it has at most 51 values
+    return [
+        Recipe.country_code.label('country'),
+        Recipe.diet_flags.label('diet'),
+        case(*[(Recipe.total_time <= limit, limit) for limit in TIME_BUCKETS], else_=None).label('total_time'),
+        func.round(cast(Recipe.avg_rating, Numeric), 1).label('rating'),
+    ]
+
+def _grouping_sets_rows(query):
+    base = query.with_entities(*_columns()).subquery()
+    columns = [base.c[name] for name in FACETS]
+    # GROUPING(a, b, c, d) has a bit set for every column left out of the row's set
+    full = (1 << len(FACETS)) - 1
+    facet_of = {full ^ (1 << (len(FACETS) - 1 - i)): name for i, name in enumerate(FACETS)}
+    rows = db.session.execute(
+        select(*columns, func.grouping(*columns), func.count()).group_by(func.grouping_sets(*columns))
+    )
+    for *values, grouping, count in rows:
+        name = facet_of[grouping]
+        yield name, values[FACETS.index(name)], count
+
+def _union_rows(query):
+    base = query.with_entities(*_columns()).cte('facet_rows').prefix_with('MATERIALIZED')
+    return db.session.execute(union_all(*[
+        select(literal(name).label('facet'), base.c[name].label('value'), func.count().label('count'))
+        .group_by(base.c[name]) for name in FACETS
+    ])).all()
+
+def facet_counts(query):
+    """{'country', 'diet', 'total_time', 'rating'} counts over the recipes a filtered listing query matches"""
+    if db.engine.dialect.name == 'postgresql':
+        rows = _grouping_sets_rows(query)
+    else:
+        rows = _union_rows(query)
+    grouped = {name: {} for name in FACETS}
+    for name, value, count in rows:
+        if value is not None:
+            grouped[name][value] = count
+
+    countries = sorted(grouped['country'].items(), key=lambda item: (-item[1], COUNTRY_NAMES.get(item[0], item[0])))
+    by_flags = grouped['diet'].items()
+    return {
+        'country': [
+            {'code': code, 'name': COUNTRY_NAMES.get(code, code), 'count': count} for code, count in countries
+        ],
+        'diet': [
+            {'diet': diet, 'count': sum(count for flags, count in by_flags if not flags & mask)}
+            for diet, mask in DIETS.items()
+        ],
+        'total_time': [
+            {'max_total_time': limit, 'count': sum(
+                count for bucket, count in grouped['total_time'].items() if bucket <= limit
+            )} for limit in TIME_BUCKETS
+        ],
+        'rating': [
+            {'min_rating': band, 'count': sum(
+                count for reached, count in grouped['rating'].items() if reached >= band
+            )} for band in RATING_BANDS
+        ],
+    }
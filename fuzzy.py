@@ -0,0 +1,257 @@
+"""Typo-tolerant recipe search over titles and ingredient names with trigrams.
+
+Two words are close when they share most of their trigrams (the three
+letter windows of "  word ", as pg_trgm does it): "biryanni" and "biryani"
+share 7 of the 10 trigrams between them. Postgres gets ``pg_trgm`` GIN
+indexes on ``lower(title)`` and ``recipe_ingredients.name``. SQLite gets a
+local inverted index:
+
+- ``fuzzy_terms``: every word used in a title or ingredient name
+- ``fuzzy_trigrams``: trigram -> term, so the terms close to a query word are
+  found from the postings of its own trigrams, never by comparing against
+  every word
+- ``fuzzy_postings``: term -> recipe, weighted higher for title words
+
+``fuzzy_scores(q)`` returns a ``(recipe_id, score)`` subquery like
+``search.search_scores``, scored by trigram similarity. ``search_scores``
+falls back to it when the exact full-text search finds nothing.
+"""
+import re
+import unicodedata
+from sqlalchemy import text, select, func, literal, union_all, Integer, Float, String
+from sqlalchemy.sql import table, column
+from database import db
+
+# Minimum Jaccard similarity of trigram sets, pg_trgm's default threshold
+THRESHOLD = 0.3
+MAX_TERMS = 8
+TITLE_WEIGHT = 2.0
+INGREDIENT_WEIGHT = 1.0
+
+_WORD = re.compile(r'[^\W\d_]{2,}')
+
+def words(value):
+    """Lower-cased, accent-free words of value"""
+    value = unicodedata.normalize('NFKD', value or '')
+    value = ''.join(ch for ch in value if not unicodedata.combining(ch))
+    return _WORD.findall(value.lower())
+
+def trigrams(word):
+    padded = f'  {word} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def _word_weights(title, ingredient_names):
+    """{word: weight} for a recipe; a word in both the title and an ingredient counts as a title word"""
+    weights = {}
+    for name in ingredient_names:
+        for word in words(name):
+            weights[word] = INGREDIENT_WEIGHT
+    for word in words(title):
+        weights[word] = TITLE_WEIGHT
+    return weights
+
+def _insert_batches(conn, target, rows, size=1000):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            conn.execute(target.insert(), batch)
+            batch = []
+    if batch:
+        conn.execute(target.insert(), batch)
+
+fuzzy_terms = table('fuzzy_terms', column('id', Integer), column('term', String), column('trigram_count', Integer))
+fuzzy_trigrams = table('fuzzy_trigrams', column('trigram', String), column('term_id', Integer))
+fuzzy_postings = table('fuzzy_postings', column('term_id', Integer), column('recipe_id', Integer), column('weight', Float))
+
+class SqliteTrigramBackend:
+    name = 'sqlite-trigram'
+
+    DDL = [
+        """CREATE TABLE IF NOT EXISTS fuzzy_terms (
+            id INTEGER PRIMARY KEY,
+            term TEXT NOT NULL UNIQUE,
+            trigram_count INTEGER NOT NULL
+        )""",
+        """CREATE TABLE IF NOT EXISTS fuzzy_trigrams (
+            trigram TEXT NOT NULL,
+            term_id INTEGER NOT NULL,
+            PRIMARY KEY (trigram, term_id)
+        ) WITHOUT ROWID""",
+        """CREATE TABLE IF NOT EXISTS fuzzy_postings (
+            term_id INTEGER NOT NULL,
+            recipe_id INTEGER NOT NULL,
+            weight REAL NOT NULL,
+            PRIMARY KEY (term_id, recipe_id)
+        ) WITHOUT ROWID""",
+        "CREATE INDEX IF NOT EXISTS ix_fuzzy_postings_recipe ON fuzzy_postings (recipe_id)",
+    ]
+
+    def install(self, conn):
+        for statement in self.DDL:
+            conn.execute(text(statement))
+
+    def rebuild(self, conn):
+        from models import Recipe, RecipeIngredient
+        names = {}
+        for recipe_id, name in conn.execute(select(RecipeIngredient.recipe_id, RecipeIngredient.name)):
+            names.setdefault(recipe_id, []).append(name)
+        vocabulary = {}
+        postings = []
+        for recipe_id, title in conn.execute(select(Recipe.id, Recipe.title)).all():
+            for word, weight in _word_weights(title, names.get(recipe_id, ())).items():
+                term_id = vocabulary.setdefault(word, len(vocabulary) + 1)
+                postings.append({'term_id': term_id, 'recipe_id': recipe_id, 'weight': weight})
+
+        conn.execute(text("DELETE FROM fuzzy_postings"))
+        conn.execute(text("DELETE FROM fuzzy_trigrams"))
+        conn.execute(text("DELETE FROM fuzzy_terms"))
+        _insert_batches(conn, fuzzy_terms, (
+            {'id': term_id, 'term': term, 'trigram_count': len(trigrams(term))} for term, term_id in vocabulary.items()
+        ))
+        _insert_batches(conn, fuzzy_trigrams, (
+            {'trigram': gram, 'term_id': term_id} for term, term_id in vocabulary.items() for gram in trigrams(term)
+        ))
+        _insert_batches(conn, fuzzy_postings, postings)
+
+    def index(self, conn, recipe_id, title, ingredient_names):
+        weights = _word_weights(title, ingredient_names)
+        conn.execute(fuzzy_postings.delete().where(fuzzy_postings.c.recipe_id == recipe_id))
+        if not weights:
+            return
+        term_ids = self._term_ids(conn, weights)
+        conn.execute(fuzzy_postings.insert(), [
+            {'term_id': term_ids[word], 'recipe_id': recipe_id, 'weight': weight} for word, weight in weights.items()
+        ])
+
+    def unindex(self, conn, recipe_id):
+        # Terms no recipe uses any more only cost a little space until the next rebuild
+        conn.execute(fuzzy_postings.delete().where(fuzzy_postings.c.recipe_id == recipe_id))
+
+    def _term_ids(self, conn, terms):
+        """{term: id}, adding the terms (and their trigrams) that aren't in the vocabulary yet"""
+        terms = list(terms)
+        ids = dict(conn.execute(select(fuzzy_terms.c.term, fuzzy_terms.c.id).where(fuzzy_terms.c.term.in_(terms))).all())
+        for term in terms:
+            if term in ids:
+                continue
+            grams = trigrams(term)
+            ids[term] = conn.execute(
+                fuzzy_terms.insert().values(term=term, trigram_count=len(grams))
+            ).lastrowid
+            conn.execute(fuzzy_trigrams.insert(), [{'trigram': gram, 'term_id': ids[term]} for gram in grams])
+        return ids
+
+    def scores(self, query_words):
+        per_word = []
+        for position, word in enumerate(query_words):
+            grams = trigrams(word)
+            shared = select(
+                fuzzy_trigrams.c.term_id, func.count().label('shared')
+            ).where(fuzzy_trigrams.c.trigram.in_(list(grams))).group_by(
+                fuzzy_trigrams.c.term_id
+            ).subquery()
+            similarity = (shared.c.shared * 1.0 / (len(grams) + fuzzy_terms.c.trigram_count - shared.c.shared))
+            close = select(shared.c.term_id, similarity.label('similarity')).join(
+                fuzzy_terms, fuzzy_terms.c.id == shared.c.term_id
+            ).where(similarity >= THRESHOLD).subquery()
+            per_word.append(select(
+                fuzzy_postings.c.recipe_id,
+                literal(position).label('position'),
+                func.max(fuzzy_postings.c.weight * close.c.similarity).label('score')
+            ).join(close, close.c.term_id == fuzzy_postings.c.term_id).group_by(fuzzy_postings.c.recipe_id))
+
+        # Short words rarely survive a typo ("pow" vs "pao"), so most words matching
+        # is enough; recipes matching more of them score higher
+        matches = union_all(*per_word).subquery()
+        return select(
+            matches.c.recipe_id.label('recipe_id'), func.sum(matches.c.score).label('score')
+        ).group_by(matches.c.recipe_id).having(func.count() >= (len(query_words) + 1) // 2)
+
+class PostgresTrigramBackend:
+    name = 'postgres-pg_trgm'
+
+    DDL = [
+        "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+        "CREATE INDEX IF NOT EXISTS ix_recipes_title_trgm ON recipes USING GIN (lower(title) gin_trgm_ops)",
+        "CREATE INDEX IF NOT EXISTS ix_recipe_ingredients_name_trgm ON recipe_ingredients USING GIN (name gin_trgm_ops)",
+    ]
+
+    def install(self, conn):
+        for statement in self.DDL:
+            conn.execute(text(statement))
+
+    def rebuild(self, conn):
+        conn.execute(text("REINDEX INDEX ix_recipes_title_trgm"))
+        conn.execute(text("REINDEX INDEX ix_recipe_ingredients_name_trgm"))
+
+    # Postgres maintains its indexes on every write
+
+    def index(self, conn, recipe_id, title, ingredient_names):
+        pass
+
+    def unindex(self, conn, recipe_id):
+        pass
+
+    def scores(self, query_words):
+        # <% is "some run of words in the right side is similar to the left side",
+        # answered from the GIN indexes; the best title or ingredient match counts
+        return text(
+            "SELECT recipe_id, MAX(score) AS score FROM ("
+            " SELECT id AS recipe_id, :title_weight * word_similarity(:q, lower(title)) AS score"
+            " FROM recipes WHERE :q <% lower(title)"
+            " UNION ALL"
+            " SELECT recipe_id, :ingredient_weight * word_similarity(:q, name) AS score"
+            " FROM recipe_ingredients WHERE :q <% name"
+            ") matches GROUP BY recipe_id"
+        ).bindparams(
+            q=' '.join(query_words), title_weight=TITLE_WEIGHT, ingredient_weight=INGREDIENT_WEIGHT
+        ).columns(recipe_id=Integer, score=Float)
+
+_backend = None
+
+def init_fuzzy_index():
+    """Create the trigram index if missing; returns None where fuzzy search isn't supported"""
+    global _backend
+    dialect = db.engine.dialect.name
+    if dialect == 'sqlite':
+        backend = SqliteTrigramBackend()
+    elif dialect == 'postgresql':
+        backend = PostgresTrigramBackend()
+    else:
+        return None
+    try:
+        with db.engine.begin() as conn:
+            backend.install(conn)
+    except Exception as e:
+        # e.g. a Postgres role that may not create the pg_trgm extension
+        print(f"Fuzzy search unavailable: {e}")
+        return None
+    _backend = backend
+    return backend
+
+def get_backend():
+    return _backend
+
+def rebuild_fuzzy_index():
+    backend = get_backend() or init_fuzzy_index()
+    if backend is not None:
+        with db.engine.begin() as conn:
+            backend.rebuild(conn)
+    return backend
+
+def index_trigrams(recipe):
+    """Refresh a recipe's entries in the trigram index; call after flush and before commit"""
+    if _backend is not None:
+        _backend.index(db.session.connection(), recipe.id, recipe.title, [item.name for item in recipe.ingredient_items])
+
+def unindex_trigrams(recipe_id):
+    if _backend is not None:
+        _backend.unindex(db.session.connection(), recipe_id)
+
+def fuzzy_scores(q):
+    """Subquery of (recipe_id, score) for recipes whose title or ingredients approximately match q, or None"""
+    query_words = words(q)[:MAX_TERMS]
+    if not query_words or _backend is None:
+        return None
+    return _backend.scores(query_words).subquery('search_scores')
@@ -0,0 +1,294 @@
+"""Parsing of free-text ingredient lines and boolean ingredient queries.
+
+``Recipe.ingredients`` stays the newline-separated text users type. Each
+line is parsed into quantity, unit and a canonical name ("2 cups Basmati
+rice, rinsed" -> 2.0, "cup", "basmati rice") and stored in the indexed
+``recipe_ingredients`` table. Every word of those names also goes into
+``recipe_ingredient_words``, which is what a one-word query is matched
+against, so "peanut" finds "peanut butter" and "chicken" finds
+"chicken breast".
+"""
+import re
+
+UNITS = {
+    'g': 'g', 'gram': 'g', 'grams': 'g',
+    'kg': 'kg', 'kilogram': 'kg', 'kilograms': 'kg',
+    'mg': 'mg',
+    'ml': 'ml', 'millilitre': 'ml', 'milliliter': 'ml', 'millilitres': 'ml', 'milliliters': 'ml',
+    'l': 'l', 'litre': 'l', 'liter': 'l', 'litres': 'l', 'liters': 'l',
+    'cup': 'cup', 'cups': 'cup',
+    'tbsp': 'tbsp', 'tablespoon': 'tbsp', 'tablespoons': 'tbsp',
+    'tsp': 'tsp', 'teaspoon': 'tsp', 'teaspoons': 'tsp',
+    'oz': 'oz', 'ounce': 'oz', 'ounces': 'oz',
+    'lb': 'lb', 'lbs': 'lb', 'pound': 'lb', 'pounds': 'lb',
+    'clove': 'clove', 'cloves': 'clove',
+    'head': 'head', 'heads': 'head',
+    'pinch': 'pinch', 'pinches': 'pinch',
+    'bunch': 'bunch', 'bunches': 'bunch',
+    'can': 'can', 'cans': 'can', 'tin': 'can', 'tins': 'can',
+    'pack': 'pack', 'packs': 'pack', 'packet': 'pack', 'packets': 'pack',
+    'slice': 'slice', 'slices': 'slice',
+    'inch': 'inch', 'inches': 'inch',
+    'handful': 'handful', 'handfuls': 'handful',
+    'sprig': 'sprig', 'sprigs': 'sprig',
+    'sheet': 'sheet', 'sheets': 'sheet',
+    'dash': 'dash', 'dashes': 'dash',
+    'piece': 'piece', 'pieces': 'piece',
+}
+
+# Words that describe the state of an ingredient rather than what it is
+DESCRIPTORS = {
+    'fresh', 'freshly', 'large', 'small', 'medium', 'whole', 'ripe', 'extra',
+    'chopped', 'minced', 'sliced', 'diced', 'grated', 'crushed', 'ground',
+    'finely', 'thinly', 'roughly', 'boneless', 'skinless', 'peeled',
+    'warm', 'cold', 'hot', 'cooked', 'uncooked', 'raw', 'dried', 'toasted',
+    'softened', 'melted', 'beaten', 'halved', 'cubed', 'shredded', 'optional',
+}
+
+# "chicken breast" should still be found by a query for "chicken"
+CUTS = {
+    'breast', 'thigh', 'wing', 'drumstick', 'leg', 'fillet', 'shank', 'strip',
+    'rib', 'belly', 'shoulder', 'loin', 'chop', 'steak', 'mince', 'cube', 'piece',
+}
+
+# Counting words that can follow the ingredient: "2 garlic cloves", "1 lettuce head"
+TRAILING_UNITS = {'clove', 'head'}
+
+# Named after what they're made from: "peanut butter" is found by "peanut"
+# (and excluded by NOT peanut) but is not "butter"
+COMPOUNDS = {
+    'peanut butter', 'almond butter', 'cashew butter', 'cocoa butter', 'apple butter',
+    'coconut milk', 'almond milk', 'oat milk', 'soy milk', 'rice milk', 'coconut cream',
+}
+
+IRREGULAR = {
+    'chilies': 'chili', 'chillies': 'chili', 'chiles': 'chili',
+    'leaves': 'leaf', 'loaves': 'loaf', 'halves': 'half',
+}
+UNCOUNTABLE = {'molasses', 'hummus', 'couscous', 'asparagus', 'swiss', 'citrus', 'asafoetida', 'harissa'}
+
+FRACTIONS = {'½': 0.5, '¼': 0.25, '¾': 0.75, '⅓': 1 / 3, '⅔': 2 / 3, '⅛': 0.125}
+
+_QUANTITY = re.compile(
+    r'^(?P<quantity>\d+\s+\d+/\d+|\d+/\d+|\d+(?:\.\d+)?\s*[½¼¾⅓⅔⅛]?|[½¼¾⅓⅔⅛])'
+    r'(?:\s*-\s*\d+(?:\.\d+)?)?\s*'
+)
+_UNIT_WORD = re.compile(r'^(?P<unit>[a-zA-Z]+)\.?(?:\s+of)?\b\s*')
+_NOTES = re.compile(r'\s+(?:to taste|for \w+|as needed)\b.*$')
+_WORD = re.compile(r"[^\W\d_][\w'\-]*")
+
+def _parse_quantity(text):
+    text = text.strip()
+    if text in FRACTIONS:
+        return FRACTIONS[text]
+    total = 0.0
+    for part in text.split():
+        if part[-1] in FRACTIONS:
+            total += FRACTIONS[part[-1]]
+            part = part[:-1]
+            if not part:
+                continue
+        if '/' in part:
+            numerator, denominator = part.split('/')
+            total += int(numerator) / int(denominator) if int(denominator) else 0
+        else:
+            total += float(part)
+    return total
+
+def singular(word):
+    if word in IRREGULAR:
+        return IRREGULAR[word]
+    if word in UNCOUNTABLE or len(word) <= 3:
+        return word
+    if word.endswith('ies'):
+        return word[:-3] + 'y'
+    if word.endswith('oes') or word.endswith(('ches', 'shes', 'sses', 'xes')):
+        return word[:-2]
+    if word.endswith('s') and not word.endswith(('ss', 'us', 'is')):
+        return word[:-1]
+    return word
+
+def canonical_name(text):
+    """Lower-case, drop descriptors and plurals: "Fresh Tomatoes" -> "tomato" """
+    words = [singular(w) for w in _WORD.findall(text.lower()) if w not in DESCRIPTORS]
+    return ' '.join(words)
+
+def _compound(name):
+    for compound in COMPOUNDS:
+        if name == compound or name.endswith(' ' + compound):
+            return compound
+    return None
+
+def head_word(name):
+    """What the ingredient is: "basmati rice" -> "rice", "chicken breast" -> "chicken", "peanut butter" as is"""
+    words = name.split()
+    if not words:
+        return ''
+    compound = _compound(name)
+    if compound:
+        return compound
+    if len(words) > 1 and words[-1] in CUTS:
+        return words[-2]
+    return words[-1]
+
+def name_words(name):
+    """The words a one-word query finds this ingredient by: all of them, less the generic end of a compound"""
+    words = name.split()
+    if _compound(name):
+        words = words[:-1]
+    return words
+
+def parse_ingredient_line(line):
+    """Parse one ingredient line, or return None for blank lines"""
+    raw = line.strip().lstrip('-*•').strip()
+    if not raw:
+        return None
+
+    # Preparation notes live in parentheses or after the first comma
+    text = re.sub(r'\([^)]*\)', ' ', raw).split(',')[0].strip()
+    text = _NOTES.sub('', text)
+
+    quantity = None
+    unit = None
+    match = _QUANTITY.match(text)
+    if match:
+        quantity = _parse_quantity(match.group('quantity'))
+        text = text[match.end():]
+    # Without a number only "pinch of ..." style phrasing marks a unit
+    match = _UNIT_WORD.match(text)
+    if match and match.group('unit').lower() in UNITS and (quantity is not None or match.group(0).rstrip().endswith(' of')):
+        unit = UNITS[match.group('unit').lower()]
+        text = text[match.end():]
+
+    name = canonical_name(text)
+    if not name and unit:
+        # "4 cloves" - the unit word was the ingredient itself
+        name, unit = singular(unit), None
+    words = name.split()
+    if unit is None and len(words) > 1 and words[-1] in TRAILING_UNITS:
+        name, unit = ' '.join(words[:-1]), words[-1]
+    if not name:
+        return None
+
+    return {
+        'raw': raw[:255],
+        'quantity': quantity,
+        'unit': unit,
+        'name': name[:100],
+        'head': head_word(name)[:50],
+    }
+
+def parse_ingredients(text):
+    """Parse a newline-separated ingredient blob into a list of dicts"""
+    parsed = []
+    for line in (text or '').splitlines():
+        item = parse_ingredient_line(line)
+        if not item:
+            continue
+        # "Salt and pepper" is two ingredients sharing one line
+        names = [n for n in re.split(r'\s+(?:and|or)\s+', item['name']) if n]
+        if len(names) > 1:
+            for name in names:
+                parsed.append(dict(item, quantity=None, unit=None, name=name, head=head_word(name)))
+        else:
+            parsed.append(item)
+    return parsed
+
+# Boolean ingredient queries: "chicken AND rice NOT peanuts", "(lamb OR beef) rice"
+_TOKEN = re.compile(r'\(|\)|[^\s()]+')
+OPERATORS = {'AND', 'OR', 'NOT'}
+
+def parse_ingredient_query(q):
+    """Parse a query into a nested tuple tree of ('and'|'or', a, b), ('not', a) and ('term', name).
+
+    Adjacent words form one multi-word ingredient ("sushi rice"), NOT binds
+    tighter than AND, AND tighter than OR, and a bare NOT after a term means
+    AND NOT. Raises ValueError on malformed queries.
+    """
+    tokens = _TOKEN.findall(q)
+    pos = 0
+
+    def peek():
+        return tokens[pos].upper() if pos < len(tokens) else None
+
+    def take():
+        nonlocal pos
+        pos += 1
+        return tokens[pos - 1]
+
+    def parse_or():
+        node = parse_and()
+        while peek() == 'OR':
+            take()
+            node = ('or', node, parse_and())
+        return node
+
+    def parse_and():
+        node = parse_unary()
+        while peek() is not None and peek() not in ('OR', ')'):
+            if peek() == 'AND':
+                take()
+            node = ('and', node, parse_unary())
+        return node
+
+    def parse_unary():
+        token = peek()
+        if token is None:
+            raise ValueError('Incomplete ingredient query')
+        if token == 'NOT':
+            take()
+            return ('not', parse_unary())
+        if token == '(':
+            take()
+            node = parse_or()
+            if peek() != ')':
+                raise ValueError('Unbalanced parentheses in ingredient query')
+            take()
+            return node
+        if token in OPERATORS or token == ')':
+            raise ValueError(f'Unexpected {tokens[pos]!r} in ingredient query')
+        words = []
+        while peek() is not None and peek() not in OPERATORS and peek() not in ('(', ')'):
+            words.append(take())
+        name = canonical_name(' '.join(words))
+        if not name:
+            raise ValueError(f'Unrecognised ingredient {" ".join(words)!r}')
+        return ('term', name)
+
+    if not tokens:
+        raise ValueError('Empty ingredient query')
+    tree = parse_or()
+    if pos != len(tokens):
+        raise ValueError(f'Unexpected {tokens[pos]!r} in ingredient query')
+    return tree
+
+def ingredient_filter(q):
+    """SQL criterion on Recipe for a boolean ingredient query.
+
+    Each term is an indexed lookup: a single word on recipe_ingredient_words
+    (any word of any ingredient name), several words on recipe_ingredients
+    by full canonical name or head. The boolean structure becomes IN / NOT
+    IN semi-joins, so the database intersects index results rather than
+    scanning ingredient text.
+    """
+    from sqlalchemy import select, and_, or_, not_
+    from models import Recipe, RecipeIngredient, RecipeIngredientWord
+
+    def build(node):
+        kind = node[0]
+        if kind == 'term':
+            name = node[1]
+            if ' ' in name:
+                matching = select(RecipeIngredient.recipe_id).where(
+                    or_(RecipeIngredient.name == name, RecipeIngredient.head == name)
+                )
+            else:
+                matching = select(RecipeIngredientWord.recipe_id).where(RecipeIngredientWord.word == name)
+            return Recipe.id.in_(matching)
+        if kind == 'not':
+            return not_(build(node[1]))
+        if kind == 'and':
+            return and_(build(node[1]), build(node[2]))
+        return or_(build(node[1]), build(node[2]))
+
+    return build(parse_ingredient_query(q))
@@ -0,0 +1,60 @@
+"""JSON encoding for API responses.
+
+Flask's default provider runs every response through the stdlib ``json``
+module. With ``JSON_PROVIDER=auto`` (the default) orjson is used instead
+when it is installed, which encodes large recipe lists several times faster.
+Apart from whitespace the output matches the default provider's: keys
+sorted, dates in HTTP format, Decimal and UUID as strings. Set ``JSON_PROVIDER=default``
+to force the stdlib provider.
+"""
+import decimal
+import uuid
+from datetime import date
+from flask.json.provider import JSONProvider, DefaultJSONProvider
+from werkzeug.http import http_date
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def _default(o):
+    # Mirrors DefaultJSONProvider.default for the types orjson hands back
+    if isinstance(o, date):
+        return http_date(o)
+    if isinstance(o, (decimal.Decimal, uuid.UUID)):
+        return str(o)
+    if hasattr(o, '__html__'):
+        return str(o.__html__())
+    raise TypeError(f'Object of type {type(o).__name__} is not JSON serializable')
+
+class OrjsonProvider(JSONProvider):
+    name = 'orjson'
+    option = orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME if orjson else 0
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=_default, option=self.option).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        # Skip the bytes -> str -> bytes round trip the base class would do
+        obj = self._prepare_response_obj(args, kwargs)
+        option = self.option | orjson.OPT_APPEND_NEWLINE
+        if self._app.debug:
+            # Pretty-printed in debug mode, as the default provider does
+            option |= orjson.OPT_INDENT_2
+        body = orjson.dumps(obj, default=_default, option=option)
+        return self._app.response_class(body, mimetype='application/json')
+
+def init_json(app):
+    """Install the JSON provider named by JSON_PROVIDER ('auto', 'orjson' or 'default')"""
+    choice = app.config.get('JSON_PROVIDER', 'auto')
+    if choice == 'orjson' and orjson is None:
+        raise RuntimeError("JSON_PROVIDER=orjson needs the 'orjson' package installed")
+    if choice in ('auto', 'orjson') and orjson is not None:
+        app.json = OrjsonProvider(app)
+    else:
+        app.json = DefaultJSONProvider(app)
+    return app.json
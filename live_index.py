@@ -0,0 +1,70 @@
+"""Base class for the in-memory indexes each worker keeps (suggest.py, pantry.py).
+
+An index is loaded from the database at startup and the recipe write routes
+keep it current in their own process. Anything else (ratings, comments,
+writes handled by another worker) reaches it through ``refresh_if_stale()``,
+which a read route calls to rebuild in a background thread once the index
+is older than a configured age. Writes that land while a rebuild is reading
+the database are replayed onto its result, so none are lost.
+
+Subclasses implement ``_load()`` (query the database, no lock held) and
+``_install(loaded)`` (swap the result in with the lock held, returning the
+number of entries), and send their writes through ``_write()``.
+"""
+import threading
+import time
+from flask import current_app
+
+class LiveIndex:
+    name = 'index'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._built_at = None
+        self._refreshing = False
+        self._pending = None   # writes to replay onto a rebuild in progress
+
+    def rebuild(self):
+        """Reload everything from the database; call inside an app context"""
+        with self._lock:
+            self._pending = []
+        loaded = self._load()
+        with self._lock:
+            count = self._install(loaded)
+            for write, args in self._pending:
+                write(*args)
+            self._pending = None
+            self._built_at = time.monotonic()
+        return count
+
+    def refresh_if_stale(self, max_age):
+        """Rebuild in a background thread if the index is more than max_age seconds old; call inside an app context"""
+        with self._lock:
+            if not max_age or self._refreshing or self._built_at is None or time.monotonic() - self._built_at < max_age:
+                return False
+            self._refreshing = True
+        threading.Thread(target=self._refresh, args=(current_app._get_current_object(),), daemon=True).start()
+        return True
+
+    def _refresh(self, app):
+        try:
+            with app.app_context():
+                self.rebuild()
+        except Exception as e:
+            print(f"Background {self.name} rebuild failed: {e}")
+        finally:
+            with self._lock:
+                self._refreshing = False
+                self._pending = None
+
+    def _write(self, write, *args):
+        with self._lock:
+            write(*args)
+            if self._pending is not None:
+                self._pending.append((write, args))
+
+    def _load(self):
+        raise NotImplementedError
+
+    def _install(self, loaded):
+        raise NotImplementedError
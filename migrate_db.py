@@ -1,13 +1,45 @@
 from app import app, db
-from models import GroupInvitation, Group
+from models import GroupInvitation, Group, Recipe
+from sqlalchemy import text
 
-with app.app_context():
-    # Add image_url column to groups table if it doesn't exist
+def add_column(table, column, ddl):
     try:
-        db.engine.execute("ALTER TABLE groups ADD COLUMN image_url VARCHAR(255)")
-        print("Added image_url column to groups table")
+        with db.engine.begin() as conn:
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+        print(f"Added {column} column to {table} table")
     except Exception as e:
-        print(f"image_url column might already exist: {e}")
+        print(f"{column} column might already exist: {e}")
+
+with app.app_context():
+    # Add image_url column to groups table if it doesn't exist
+    add_column('groups', 'image_url', 'VARCHAR(255)')
+    
+    # Stored recipe statistics (run recompute_recipe_stats.py afterwards to fill them)
+    add_column('recipes', 'rating_sum', 'INTEGER NOT NULL DEFAULT 0')
+    add_column('recipes', 'rating_count', 'INTEGER NOT NULL DEFAULT 0')
+    add_column('recipes', 'comment_count', 'INTEGER NOT NULL DEFAULT 0')
+    add_column('recipes', 'bayes_score', f'FLOAT NOT NULL DEFAULT {Recipe.PRIOR_MEAN}')
+    
+    # Version counters behind the ETag / Last-Modified headers
+    add_column('recipes', 'version', 'INTEGER NOT NULL DEFAULT 1')
+    add_column('recipes', 'updated_at', 'TIMESTAMP')
+    add_column('groups', 'version', 'INTEGER NOT NULL DEFAULT 1')
+    add_column('groups', 'updated_at', 'TIMESTAMP')
+    
+    # Trending score behind sort_by=trending (run rollup_trending.py afterwards to fill it)
+    add_column('recipes', 'trending_score', 'FLOAT NOT NULL DEFAULT 0')
+    
+    # Diet/allergen bitmask (run backfill_ingredients.py afterwards to fill it)
+    add_column('recipes', 'diet_flags', 'INTEGER NOT NULL DEFAULT 0')
+    
+    # Stored prep + cook time behind the time range filters
+    add_column('recipes', 'total_time', 'INTEGER')
+    with db.engine.begin() as conn:
+        filled = conn.execute(text(
+            "UPDATE recipes SET total_time = COALESCE(prep_time, 0) + COALESCE(cook_time, 0) "
+            "WHERE total_time IS NULL AND (prep_time IS NOT NULL OR cook_time IS NOT NULL)"
+        )).rowcount
+    print(f"Filled total_time for {filled} recipes")
     
     # Create group_invitations table
     try:
@@ -16,4 +48,18 @@ with app.app_context():
     except Exception as e:
         print(f"Error creating tables: {e}")
     
+    # Resolved country code, after create_all so the countries table it
+    # references exists (run backfill_countries.py afterwards to fill it)
+    add_column('recipes', 'country_code', 'VARCHAR(2) REFERENCES countries(code)')
+    
+    # create_all only builds indexes for brand new tables, so add any
+    # index declared on a model that an existing table is still missing
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            try:
+                index.create(db.engine, checkfirst=True)
+            except Exception as e:
+                print(f"Error creating index {index.name}: {e}")
+    print("Indexes up to date")
+    
     print("Migration completed!")
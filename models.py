@@ -1,4 +1,10 @@
 from database import db
+from ingredients import parse_ingredients, name_words
+from diet import classify
+from countries import resolve_country
+from sqlalchemy import event
+from sqlalchemy.orm import defer
+from sqlalchemy.ext.hybrid import hybrid_property
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
 
@@ -39,6 +45,8 @@ class Payment(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     user = db.relationship('User', backref='payments')
+    
+    __table_args__ = (db.Index('ix_payments_user_created', 'user_id', 'created_at', 'id'),)
 
 class Recipe(db.Model):
     __tablename__ = 'recipes'
@@ -51,46 +59,163 @@ class Recipe(db.Model):
     image_url = db.Column(db.String(255))
     prep_time = db.Column(db.Integer)
     cook_time = db.Column(db.Integer)
+    total_time = db.Column(db.Integer)  # prep_time + cook_time, kept in step by sync_total_time
     servings = db.Column(db.Integer)
-    country = db.Column(db.String(100))
+    country = db.Column(db.String(100))  # as entered
+    # ISO code the country text resolves to (see countries.py), kept in step by sync_country_code
+    country_code = db.Column(db.String(2), db.ForeignKey('countries.code'))
     is_premium = db.Column(db.Boolean, default=False)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     group_id = db.Column(db.Integer, db.ForeignKey('groups.id'), nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    # Denormalized counters kept in step by the rating/comment write paths
+    # (see adjust_stats) and rebuilt by recompute_recipe_stats.py
+    rating_sum = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    rating_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    comment_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    
+    # sort_by=rating ranks by a Bayesian average: every recipe starts with
+    # PRIOR_WEIGHT imaginary ratings of PRIOR_MEAN, so one 5-star rating can't
+    # outrank hundreds of 4.8s. Stored so top-N is an index scan.
+    PRIOR_MEAN = 3.5
+    PRIOR_WEIGHT = 5
+    bayes_score = db.Column(db.Float, nullable=False, default=PRIOR_MEAN, server_default=str(PRIOR_MEAN))
+    
+    # Bumped on every change to the recipe or its ratings/comments; drives ETags
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    # Time-decayed recent activity, rewritten by rollup_trending.py (never per request)
+    trending_score = db.Column(db.Float, nullable=False, default=0, server_default='0')
+    
+    # Bitmask of what the ingredients contain (meat, dairy, gluten, ...; see diet.py),
+    # set together with the parsed ingredient rows
+    diet_flags = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    
     user = db.relationship('User', backref='recipes')
     group = db.relationship('Group', backref='recipes')
     comments = db.relationship('Comment', backref='recipe', lazy=True, cascade='all, delete-orphan')
     ratings = db.relationship('Rating', backref='recipe', lazy=True, cascade='all, delete-orphan')
     bookmarks = db.relationship('Bookmark', backref='recipe', lazy=True, cascade='all, delete-orphan')
+    ingredient_items = db.relationship('RecipeIngredient', backref='recipe', lazy=True, cascade='all, delete-orphan',
+                                       order_by='RecipeIngredient.position')
+    ingredient_words = db.relationship('RecipeIngredientWord', lazy=True, cascade='all, delete-orphan')
     
-    def get_avg_rating(self):
-        if not self.ratings:
+    # Composite indexes backing the keyset-paginated listings (sort key + id)
+    __table_args__ = (
+        db.Index('ix_recipes_created_id', 'created_at', 'id'),
+        db.Index('ix_recipes_title_id', 'title', 'id'),
+        db.Index('ix_recipes_user_created', 'user_id', 'created_at', 'id'),
+        db.Index('ix_recipes_group_created', 'group_id', 'created_at', 'id'),
+        db.Index('ix_recipes_trending_id', 'trending_score', 'id'),
+        db.Index('ix_recipes_bayes_id', 'bayes_score', 'id'),
+        db.Index('ix_recipes_country_code_bayes', 'country_code', 'bayes_score', 'id'),
+        db.Index('ix_recipes_total_time', 'total_time', 'id'),
+        db.Index('ix_recipes_country_code_total_time', 'country_code', 'total_time', 'id'),
+        db.Index('ix_recipes_country_code_created', 'country_code', 'created_at', 'id'),
+    )
+    
+    @hybrid_property
+    def avg_rating(self):
+        if not self.rating_count:
             return 0
-        return sum(r.rating for r in self.ratings) / len(self.ratings)
+        return self.rating_sum / self.rating_count
+    
+    @avg_rating.expression
+    def avg_rating(cls):
+        return db.case(
+            (cls.rating_count > 0, db.cast(cls.rating_sum, db.Float) / cls.rating_count),
+            else_=0.0
+        )
+    
+    def get_avg_rating(self):
+        return self.avg_rating
+    
+    @classmethod
+    def bayes_expression(cls, rating_sum, rating_count):
+        """The Bayesian average for the given rating sum and count (columns or SQL expressions)"""
+        return (cls.PRIOR_WEIGHT * cls.PRIOR_MEAN + rating_sum) / (cls.PRIOR_WEIGHT + rating_count)
+    
+    @classmethod
+    def adjust_stats(cls, recipe_id, rating_sum=0, rating_count=0, comment_count=0):
+        """Apply deltas to the stored counters as a single UPDATE so concurrent writes can't lose increments"""
+        db.session.query(cls).filter(cls.id == recipe_id).update({
+            cls.rating_sum: cls.rating_sum + rating_sum,
+            cls.rating_count: cls.rating_count + rating_count,
+            cls.bayes_score: cls.bayes_expression(cls.rating_sum + rating_sum, cls.rating_count + rating_count),
+            cls.comment_count: cls.comment_count + comment_count,
+            cls.version: cls.version + 1
+        })
+    
+    @classmethod
+    def update_quietly(cls, *criteria, bump_version=False, **values):
+        """An UPDATE of recipes for bulk jobs that doesn't count as an edit.
+
+        updated_at keeps its value instead of taking the onupdate default, so
+        Last-Modified and the recommendation refresh only see real edits.
+        bump_version still gives the changed rows a new ETag, for values that
+        show up in responses.
+        """
+        values[cls.updated_at.key] = cls.updated_at
+        if bump_version:
+            values[cls.version.key] = cls.version + 1
+        return cls.__table__.update().where(*criteria).values(**values)
+    
+    @classmethod
+    def touch(cls, recipe_id):
+        """Bump the version after a change to a child row that doesn't move any counter"""
+        db.session.query(cls).filter(cls.id == recipe_id).update({cls.version: cls.version + 1})
     
-    def to_dict(self, include_stats=True):
+    @classmethod
+    def get_validators(cls, recipe_id):
+        """(etag, last_modified) for a recipe without loading it, or None if it doesn't exist"""
+        row = db.session.query(cls.version, cls.updated_at).filter(cls.id == recipe_id).first()
+        if row is None:
+            return None
+        return f'recipe-{recipe_id}-v{row.version}', row.updated_at
+    
+    # Text columns that can run to kilobytes; list views can leave them out
+    LARGE_FIELDS = ('description', 'ingredients', 'instructions')
+    SUMMARY_FIELDS = frozenset([
+        'id', 'title', 'description', 'image_url', 'prep_time', 'cook_time', 'servings',
+        'country', 'country_code', 'is_premium', 'user_id', 'group_id', 'created_at', 'author',
+        'avg_rating', 'rating_count', 'comment_count'
+    ])
+    
+    @classmethod
+    def field_options(cls, fields):
+        """Loader options deferring the large columns a fields selection leaves out"""
+        if fields is None:
+            return []
+        return [defer(getattr(cls, name)) for name in cls.LARGE_FIELDS if name not in fields]
+    
+    def to_dict(self, include_stats=True, fields=None):
         data = {
             'id': self.id,
             'title': self.title,
-            'description': self.description,
-            'ingredients': self.ingredients,
-            'instructions': self.instructions,
             'image_url': self.image_url,
             'prep_time': self.prep_time,
             'cook_time': self.cook_time,
             'servings': self.servings,
             'country': self.country,
+            'country_code': self.country_code,
             'is_premium': self.is_premium,
             'user_id': self.user_id,
             'group_id': self.group_id,
             'created_at': self.created_at.isoformat(),
             'author': self.user.username if self.user else None
         }
+        # Only touch large columns that were asked for, so deferred ones stay unloaded
+        for name in self.LARGE_FIELDS:
+            if fields is None or name in fields:
+                data[name] = getattr(self, name)
         if include_stats:
-            data['avg_rating'] = round(self.get_avg_rating(), 1)
-            data['rating_count'] = len(self.ratings)
-            data['comment_count'] = len(self.comments)
+            data['avg_rating'] = round(self.avg_rating, 1)
+            data['rating_count'] = self.rating_count
+            data['comment_count'] = self.comment_count
+        if fields is not None:
+            data = {key: value for key, value in data.items() if key in fields or key == 'id'}
         return data
 
 class Group(db.Model):
@@ -103,10 +228,28 @@ class Group(db.Model):
     created_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    # Bumped on every change to the group or its membership; drives ETags
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
     creator = db.relationship('User', backref='created_groups')
     members = db.relationship('GroupMember', backref='group', lazy=True, cascade='all, delete-orphan')
     invitations = db.relationship('GroupInvitation', backref='group', lazy=True, cascade='all, delete-orphan')
     
+    __table_args__ = (db.Index('ix_groups_created_id', 'created_at', 'id'),)
+    
+    @classmethod
+    def touch(cls, group_id):
+        db.session.query(cls).filter(cls.id == group_id).update({cls.version: cls.version + 1})
+    
+    @classmethod
+    def get_validators(cls, group_id):
+        """(etag, last_modified) for a group without loading it, or None if it doesn't exist"""
+        row = db.session.query(cls.version, cls.updated_at).filter(cls.id == group_id).first()
+        if row is None:
+            return None
+        return f'group-{group_id}-v{row.version}', row.updated_at
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -116,7 +259,7 @@ class Group(db.Model):
             'created_by': self.created_by,
             'creator_name': self.creator.username if self.creator else None,
             'created_at': self.created_at.isoformat(),
-            'member_count': len(self.members)
+            'member_count': self.member_count
         }
 
 class GroupMember(db.Model):
@@ -130,6 +273,8 @@ class GroupMember(db.Model):
     
     user = db.relationship('User', backref='group_memberships')
     
+    __table_args__ = (db.Index('ix_group_members_group_user', 'group_id', 'user_id'),)
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -140,6 +285,14 @@ class GroupMember(db.Model):
             'joined_at': self.joined_at.isoformat()
         }
 
+# Counted in SQL alongside each Group row so listing groups doesn't load every member
+Group.member_count = db.column_property(
+    db.select(db.func.count(GroupMember.id))
+    .where(GroupMember.group_id == Group.id)
+    .correlate_except(GroupMember)
+    .scalar_subquery()
+)
+
 class Comment(db.Model):
     __tablename__ = 'comments'
     
@@ -152,6 +305,11 @@ class Comment(db.Model):
     
     user = db.relationship('User', backref='comments')
     
+    __table_args__ = (
+        db.Index('ix_comments_recipe_created', 'recipe_id', 'created_at', 'id'),
+        db.Index('ix_comments_created', 'created_at'),
+    )
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -172,10 +330,16 @@ class Rating(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    # Ratings above this count as liking the recipe for recommendations
+    NEUTRAL = 3
+    
     user = db.relationship('User', backref='ratings')
     
     # Unique constraint: one rating per user per recipe
-    __table_args__ = (db.UniqueConstraint('user_id', 'recipe_id', name='unique_user_recipe_rating'),)
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'recipe_id', name='unique_user_recipe_rating'),
+        db.Index('ix_ratings_created', 'created_at'),
+    )
     
     def to_dict(self):
         return {
@@ -197,7 +361,11 @@ class Bookmark(db.Model):
     
     user = db.relationship('User', backref='bookmarks')
     
-    __table_args__ = (db.UniqueConstraint('user_id', 'recipe_id', name='unique_user_recipe_bookmark'),)
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'recipe_id', name='unique_user_recipe_bookmark'),
+        db.Index('ix_bookmarks_user_created', 'user_id', 'created_at', 'id'),
+        db.Index('ix_bookmarks_created', 'created_at'),
+    )
     
     def to_dict(self):
         return {
@@ -230,3 +398,125 @@ class GroupInvitation(db.Model):
             'status': self.status,
             'created_at': self.created_at.isoformat()
         }
+
+class RecipeIngredient(db.Model):
+    __tablename__ = 'recipe_ingredients'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    recipe_id = db.Column(db.Integer, db.ForeignKey('recipes.id', ondelete='CASCADE'), nullable=False, index=True)
+    position = db.Column(db.Integer, nullable=False, default=0)
+    raw = db.Column(db.String(255), nullable=False)
+    quantity = db.Column(db.Float)
+    unit = db.Column(db.String(20))
+    name = db.Column(db.String(100), nullable=False)  # canonical, e.g. 'basmati rice'
+    head = db.Column(db.String(50), nullable=False)   # what a one-word query matches, e.g. 'rice'
+    
+    # (name, recipe_id) lets ingredient queries be answered from the index alone
+    __table_args__ = (
+        db.Index('ix_recipe_ingredients_name_recipe', 'name', 'recipe_id'),
+        db.Index('ix_recipe_ingredients_head_recipe', 'head', 'recipe_id'),
+    )
+    
+    def to_dict(self):
+        return {
+            'raw': self.raw,
+            'quantity': self.quantity,
+            'unit': self.unit,
+            'name': self.name
+        }
+
+class RecipeIngredientWord(db.Model):
+    """One word of a recipe's ingredient names; what one-word ingredient queries match"""
+    __tablename__ = 'recipe_ingredient_words'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    recipe_id = db.Column(db.Integer, db.ForeignKey('recipes.id', ondelete='CASCADE'), nullable=False, index=True)
+    word = db.Column(db.String(50), nullable=False)
+    
+    __table_args__ = (db.Index('ix_recipe_ingredient_words_word_recipe', 'word', 'recipe_id'),)
+
+def ingredient_words(names):
+    """The distinct words recipe_ingredient_words holds for these canonical ingredient names"""
+    return sorted({word[:50] for name in names for word in name_words(name)})
+
+@event.listens_for(Recipe.ingredients, 'set')
+def sync_ingredient_items(recipe, value, oldvalue, initiator):
+    """Re-parse the structured ingredient rows, their words and diet flags whenever the ingredient text is set"""
+    parsed = parse_ingredients(value)
+    recipe.ingredient_items = [RecipeIngredient(position=position, **item) for position, item in enumerate(parsed)]
+    recipe.ingredient_words = [RecipeIngredientWord(word=word) for word in ingredient_words(item['name'] for item in parsed)]
+    recipe.diet_flags = classify(item['name'] for item in parsed)
+
+def total_time(prep_time, cook_time):
+    """Recipe.total_time for the given times; a missing one counts as 0 unless both are"""
+    if prep_time is None and cook_time is None:
+        return None
+    return (prep_time or 0) + (cook_time or 0)
+
+@event.listens_for(Recipe.prep_time, 'set')
+def sync_total_time_prep(recipe, value, oldvalue, initiator):
+    recipe.total_time = total_time(value, recipe.cook_time)
+
+@event.listens_for(Recipe.cook_time, 'set')
+def sync_total_time_cook(recipe, value, oldvalue, initiator):
+    recipe.total_time = total_time(recipe.prep_time, value)
+
+@event.listens_for(Recipe.country, 'set')
+def sync_country_code(recipe, value, oldvalue, initiator):
+    recipe.country_code = resolve_country(value)
+
+class RecipeSimilarity(db.Model):
+    """Precomputed nearest neighbours of a recipe, written by the offline recommendation jobs"""
+    __tablename__ = 'recipe_similarities'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    recipe_id = db.Column(db.Integer, db.ForeignKey('recipes.id', ondelete='CASCADE'), nullable=False)
+    similar_recipe_id = db.Column(db.Integer, db.ForeignKey('recipes.id', ondelete='CASCADE'), nullable=False)
+    score = db.Column(db.Float, nullable=False)
+    source = db.Column(db.String(20), nullable=False)  # 'cf' (ratings/bookmarks) or 'content' (TF-IDF)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    # "Top neighbours of recipe X from source S" is one range scan of this index
+    __table_args__ = (
+        db.Index('ix_recipe_similarities_lookup', 'recipe_id', 'source', 'score'),
+        db.Index('ix_recipe_similarities_similar', 'similar_recipe_id'),
+    )
+
+class ContentTerm(db.Model):
+    """How many recipes use a term; the document frequency behind TF-IDF weights"""
+    __tablename__ = 'content_terms'
+    
+    term = db.Column(db.String(50), primary_key=True)
+    doc_count = db.Column(db.Integer, nullable=False, default=0)
+
+class RecipeTerm(db.Model):
+    """One entry of a recipe's sparse, unit-length TF-IDF vector"""
+    __tablename__ = 'recipe_terms'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    recipe_id = db.Column(db.Integer, db.ForeignKey('recipes.id', ondelete='CASCADE'), nullable=False, index=True)
+    term = db.Column(db.String(50), nullable=False)
+    weight = db.Column(db.Float, nullable=False)
+    
+    # Inverted index: recipes sharing a term, with their weights, straight from the index
+    __table_args__ = (db.Index('ix_recipe_terms_term', 'term', 'recipe_id', 'weight'),)
+
+class Rollup(db.Model):
+    """When a periodic rollup job last ran, so the next run only reads newer events"""
+    __tablename__ = 'rollups'
+    
+    name = db.Column(db.String(50), primary_key=True)
+    ran_at = db.Column(db.DateTime, nullable=False)
+
+class Country(db.Model):
+    """ISO 3166-1 country, filled from countries.py by sync_countries()"""
+    __tablename__ = 'countries'
+    
+    code = db.Column(db.String(2), primary_key=True)
+    name = db.Column(db.String(100), nullable=False, unique=True)
+    
+    def to_dict(self):
+        return {
+            'code': self.code,
+            'name': self.name
+        }
@@ -0,0 +1,148 @@
+"""Rank recipes by how much of them a pantry already covers.
+
+Every recipe's distinct canonical ingredient names (from
+``recipe_ingredients``) are held in memory as integer postings: for each
+name, a numpy array of the rows of the recipes using it. A pantry lookup
+concatenates the postings of the names it covers and one ``np.bincount``
+gives every recipe's number of covered ingredients at once; the missing
+count is the recipe's ingredient count minus that. No SQL runs until the
+winning rows are loaded for the response.
+
+A pantry item covers an ingredient with the same canonical name or with
+that as its head word ("rice" covers "basmati rice"). ``STAPLES`` are
+assumed to be in every kitchen and never count as missing.
+
+Built at startup (``pantry_index.rebuild()``) and kept current as described
+in live_index.py; recipes written by other workers arrive when the pantry
+route refreshes an index older than ``PANTRY_REFRESH_SECONDS``.
+"""
+import numpy as np
+from database import db
+from ingredients import canonical_name, head_word
+from live_index import LiveIndex
+
+STAPLES = {'salt', 'pepper', 'black pepper', 'water', 'oil', 'vegetable oil', 'cooking oil'}
+MAX_PANTRY_ITEMS = 100
+
+def _grow(array, capacity):
+    grown = np.zeros(capacity, dtype=array.dtype)
+    grown[:len(array)] = array
+    return grown
+
+class PantryIndex(LiveIndex):
+    name = 'pantry'
+
+    def __init__(self):
+        super().__init__()
+        self._reset(0)
+
+    def _reset(self, capacity):
+        self._name_ids = {}        # canonical name -> id
+        self._names = []           # id -> canonical name
+        self._heads = {}           # head word -> ids of the names it covers
+        self._postings = []        # name id -> list of rows
+        self._arrays = {}          # name id -> cached np.array of its postings
+        self._rows = {}            # recipe id -> row
+        self._row_names = []       # row -> name ids
+        self._recipe_ids = np.zeros(capacity, dtype=np.int64)
+        self._needed = np.zeros(capacity, dtype=np.int32)   # non-staple ingredients
+        self._alive = np.zeros(capacity, dtype=bool)
+        self._size = 0
+
+    def _load(self):
+        from models import Recipe, RecipeIngredient
+        names = {recipe_id: set() for recipe_id, in db.session.query(Recipe.id)}
+        for recipe_id, name in db.session.query(RecipeIngredient.recipe_id, RecipeIngredient.name):
+            if recipe_id in names:
+                names[recipe_id].add(name)
+        return names
+
+    def _install(self, names):
+        self._reset(len(names))
+        for recipe_id, recipe_names in names.items():
+            self._add(recipe_id, recipe_names)
+        return len(names)
+
+    def add_recipe(self, recipe):
+        """Index a new or edited recipe (after commit); replaces what was indexed for it before"""
+        self._write(self._replace, recipe.id, {item.name for item in recipe.ingredient_items})
+
+    def remove_recipe(self, recipe_id):
+        self._write(self._remove, recipe_id)
+
+    def rank(self, pantry, limit, max_missing=None):
+        """[(recipe_id, matched, missing names)] best first: fewest missing, then most matched"""
+        with self._lock:
+            covered = set()
+            for item in pantry:
+                name = canonical_name(item)
+                if name in self._name_ids:
+                    covered.add(self._name_ids[name])
+                covered |= self._heads.get(name, set())
+            covered = [name_id for name_id in covered if self._names[name_id] not in STAPLES]
+            if not covered or not self._size:
+                return []
+
+            hits = np.concatenate([self._postings_array(name_id) for name_id in covered])
+            matched = np.bincount(hits, minlength=self._size)
+            missing = self._needed[:self._size] - matched
+            keep = (matched > 0) & self._alive[:self._size]
+            if max_missing is not None:
+                keep &= missing <= max_missing
+            rows = np.flatnonzero(keep)
+            rows = rows[np.lexsort((self._recipe_ids[rows], -matched[rows], missing[rows]))[:limit]]
+
+            covered = set(covered)
+            return [(
+                int(self._recipe_ids[row]), int(matched[row]), sorted(
+                    self._names[name_id] for name_id in self._row_names[row]
+                    if name_id not in covered and self._names[name_id] not in STAPLES
+                )
+            ) for row in rows]
+
+    # The helpers below expect self._lock to be held
+
+    def _postings_array(self, name_id):
+        array = self._arrays.get(name_id)
+        if array is None:
+            array = self._arrays[name_id] = np.array(self._postings[name_id], dtype=np.int64)
+        return array
+
+    def _name_id(self, name):
+        name_id = self._name_ids.get(name)
+        if name_id is None:
+            name_id = self._name_ids[name] = len(self._names)
+            self._names.append(name)
+            self._postings.append([])
+            self._heads.setdefault(head_word(name), set()).add(name_id)
+        return name_id
+
+    def _replace(self, recipe_id, names):
+        self._remove(recipe_id)
+        self._add(recipe_id, names)
+
+    def _add(self, recipe_id, names):
+        row = self._size
+        if row == len(self._alive):
+            capacity = max(1024, row * 2)
+            self._recipe_ids = _grow(self._recipe_ids, capacity)
+            self._needed = _grow(self._needed, capacity)
+            self._alive = _grow(self._alive, capacity)
+        name_ids = [self._name_id(name) for name in names]
+        for name_id in name_ids:
+            self._postings[name_id].append(row)
+            self._arrays.pop(name_id, None)
+        self._recipe_ids[row] = recipe_id
+        self._needed[row] = sum(1 for name in names if name not in STAPLES)
+        self._alive[row] = True
+        self._row_names.append(name_ids)
+        self._rows[recipe_id] = row
+        self._size += 1
+
+    def _remove(self, recipe_id):
+        # The row's postings stay behind, masked out by _alive, until the next rebuild
+        row = self._rows.pop(recipe_id, None)
+        if row is not None:
+            self._alive[row] = False
+
+pantry_index = PantryIndex()
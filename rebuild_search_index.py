@@ -0,0 +1,14 @@
+from app import app
+from search import rebuild_search_index
+from fuzzy import rebuild_fuzzy_index
+
+def rebuild():
+    with app.app_context():
+        backend = rebuild_search_index()
+        print(f"Rebuilt recipe search index ({backend.name})")
+        backend = rebuild_fuzzy_index()
+        if backend is not None:
+            print(f"Rebuilt fuzzy search index ({backend.name})")
+
+if __name__ == '__main__':
+    rebuild()
@@ -0,0 +1,203 @@
+"""Offline item-to-item recommendations from ratings and bookmarks.
+
+Every user's positive interactions form a sparse user x recipe matrix: a
+rating counts for ``rating - Rating.NEUTRAL`` (so 1-3 stars count for nothing),
+a bookmark for ``BOOKMARK_WEIGHT``. Recipes are compared by the cosine of their
+columns and the ``TOP_K`` best neighbours of each are written to
+``recipe_similarities`` with ``source='cf'``. Requests never touch the matrix;
+they read those rows back through ``ix_recipe_similarities_lookup``.
+
+``rebuild_collaborative()`` recomputes every recipe; ``refresh_collaborative()``
+only recomputes recipes whose ratings or bookmarks changed since the last run
+(plus every recipe whose score against them can have moved).
+``rebuild_content()`` does the same for the TF-IDF vectors and neighbours
+described in ``content_index``.
+"""
+from collections import Counter
+from datetime import datetime
+from itertools import repeat
+import numpy as np
+from scipy import sparse
+from sqlalchemy import select, union_all, literal, func
+from database import db
+from models import Recipe, Rating, Bookmark, RecipeSimilarity, RecipeTerm, ContentTerm
+import content_index
+
+TOP_K = 20
+MIN_SCORE = 0.01
+BATCH_SIZE = 1000
+DENSE_CELLS = 25_000_000
+BOOKMARK_WEIGHT = 2
+
+def normalize_rows(matrix):
+    """Scale each row of a sparse matrix to unit length so dot products are cosines"""
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    return (sparse.diags(1 / norms) @ matrix).tocsr()
+
+def top_neighbours(vectors, ids, rows=None, k=TOP_K):
+    """Yield (id, neighbour_id, score) for the k nearest rows of each of rows.
+
+    vectors must be a row-normalized CSR matrix whose row i belongs to ids[i].
+    Similarities are computed for a batch of rows at a time, sized so a batch
+    holds at most DENSE_CELLS scores, so memory stays bounded however large
+    the catalogue grows.
+    """
+    count = vectors.shape[0]
+    k = min(k, count - 1)
+    if k <= 0:
+        return
+    rows = np.arange(count) if rows is None else np.asarray(rows)
+    others = vectors.T.tocsr()
+    batch_size = max(1, min(BATCH_SIZE, DENSE_CELLS // count))
+    for start in range(0, len(rows), batch_size):
+        batch = rows[start:start + batch_size]
+        sims = (vectors[batch] @ others).toarray()
+        sims[np.arange(len(batch)), batch] = 0
+        top = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+        scores = np.take_along_axis(sims, top, axis=1)
+        for row, cols, row_scores in zip(batch, top, scores):
+            keep = row_scores >= MIN_SCORE
+            yield from zip(repeat(int(ids[row])), ids[cols[keep]].tolist(), row_scores[keep].tolist())
+
+def store_neighbours(source, neighbours, recipe_ids=None, updated_at=None):
+    """Replace the stored neighbours from source, only for recipe_ids when given"""
+    updated_at = updated_at or datetime.utcnow()
+    query = db.session.query(RecipeSimilarity).filter(RecipeSimilarity.source == source)
+    if recipe_ids is None:
+        query.delete(synchronize_session=False)
+    else:
+        recipe_ids = [int(recipe_id) for recipe_id in recipe_ids]
+        for start in range(0, len(recipe_ids), BATCH_SIZE):
+            query.filter(
+                RecipeSimilarity.recipe_id.in_(recipe_ids[start:start + BATCH_SIZE])
+            ).delete(synchronize_session=False)
+
+    total = 0
+    rows = []
+    for recipe_id, similar_recipe_id, score in neighbours:
+        rows.append({'recipe_id': recipe_id, 'similar_recipe_id': similar_recipe_id,
+                     'score': score, 'source': source, 'updated_at': updated_at})
+        if len(rows) == BATCH_SIZE:
+            db.session.execute(RecipeSimilarity.__table__.insert(), rows)
+            total += len(rows)
+            rows = []
+    if rows:
+        db.session.execute(RecipeSimilarity.__table__.insert(), rows)
+        total += len(rows)
+    db.session.commit()
+    return total
+
+def interaction_matrix():
+    """(recipe x user CSR matrix of interaction weights, recipe id of each row)"""
+    ratings = select(
+        Rating.user_id, Rating.recipe_id, (Rating.rating - Rating.NEUTRAL).label('weight')
+    ).where(Rating.rating > Rating.NEUTRAL)
+    bookmarks = select(Bookmark.user_id, Bookmark.recipe_id, literal(BOOKMARK_WEIGHT).label('weight'))
+    interactions = union_all(ratings, bookmarks).subquery()
+    # A bookmarked 5-star recipe counts once, at the stronger weight
+    rows = db.session.execute(
+        select(interactions.c.user_id, interactions.c.recipe_id, func.max(interactions.c.weight))
+        .group_by(interactions.c.user_id, interactions.c.recipe_id)
+    ).all()
+    if not rows:
+        return sparse.csr_matrix((0, 0), dtype=np.float32), np.array([], dtype=np.int64)
+
+    user_ids, recipe_ids, weights = (np.array(column) for column in zip(*rows))
+    recipe_index, recipe_rows = np.unique(recipe_ids, return_inverse=True)
+    _, user_cols = np.unique(user_ids, return_inverse=True)
+    matrix = sparse.csr_matrix(
+        (weights.astype(np.float32), (recipe_rows, user_cols)),
+        shape=(len(recipe_index), user_cols.max() + 1)
+    )
+    return matrix, recipe_index
+
+def rebuild_collaborative():
+    """Recompute the neighbours of every recipe; returns the number of rows stored"""
+    started = datetime.utcnow()
+    matrix, ids = interaction_matrix()
+    return store_neighbours('cf', top_neighbours(normalize_rows(matrix), ids), updated_at=started)
+
+def refresh_collaborative(since=None):
+    """Recompute neighbours only for recipes whose interactions changed after since.
+
+    since defaults to the time of the last run. Recipe.updated_at moves on
+    every rating write (see Recipe.adjust_stats) and new bookmarks carry their
+    own timestamp; removed bookmarks are picked up by the next full rebuild.
+    Returns the number of recipes refreshed.
+    """
+    started = datetime.utcnow()
+    if since is None:
+        since = db.session.query(func.max(RecipeSimilarity.updated_at)).filter(
+            RecipeSimilarity.source == 'cf'
+        ).scalar()
+        if since is None:
+            rebuild_collaborative()
+            return db.session.query(func.count(Recipe.id)).scalar()
+
+    changed = {recipe_id for recipe_id, in db.session.query(Recipe.id).filter(Recipe.updated_at > since)}
+    changed |= {recipe_id for recipe_id, in db.session.query(Bookmark.recipe_id).filter(Bookmark.created_at > since)}
+    if not changed:
+        return 0
+    # Their old neighbours hold a score for them that may no longer be right
+    changed |= {recipe_id for recipe_id, in db.session.query(RecipeSimilarity.recipe_id).filter(
+        RecipeSimilarity.source == 'cf', RecipeSimilarity.similar_recipe_id.in_(changed)
+    )}
+
+    matrix, ids = interaction_matrix()
+    rows = np.flatnonzero(np.isin(ids, list(changed)))
+    # and any recipe sharing a user with a changed one may now rank it differently
+    users = np.unique(matrix[rows].indices)
+    rows = np.union1d(rows, np.unique(matrix.tocsc()[:, users].indices))
+    changed |= set(ids[rows].tolist())
+
+    store_neighbours('cf', top_neighbours(normalize_rows(matrix), ids, rows),
+                     recipe_ids=changed, updated_at=started)
+    return len(changed)
+
+def _insert_batches(table, rows):
+    rows = list(rows)
+    for start in range(0, len(rows), BATCH_SIZE):
+        db.session.execute(table.insert(), rows[start:start + BATCH_SIZE])
+
+def rebuild_content():
+    """Recompute every recipe's TF-IDF vector and content neighbours; returns the number of neighbour rows stored"""
+    started = datetime.utcnow()
+    counts = {}
+    last_id = 0
+    while True:
+        batch = db.session.query(Recipe.id, Recipe.title, Recipe.description, Recipe.ingredients).filter(
+            Recipe.id > last_id
+        ).order_by(Recipe.id).limit(BATCH_SIZE).all()
+        if not batch:
+            break
+        for recipe_id, title, description, ingredients in batch:
+            counts[recipe_id] = content_index.term_counts(title, description, ingredients)
+        last_id = batch[-1].id
+
+    doc_counts = Counter(term for recipe_counts in counts.values() for term in recipe_counts)
+    vectors = {
+        recipe_id: content_index.term_vector(recipe_counts, doc_counts, len(counts))
+        for recipe_id, recipe_counts in counts.items()
+    }
+
+    db.session.query(ContentTerm).delete(synchronize_session=False)
+    db.session.query(RecipeTerm).delete(synchronize_session=False)
+    _insert_batches(ContentTerm.__table__, ({'term': term, 'doc_count': n} for term, n in doc_counts.items()))
+    _insert_batches(RecipeTerm.__table__, (
+        {'recipe_id': recipe_id, 'term': term, 'weight': weight}
+        for recipe_id, vector in vectors.items() for term, weight in vector.items()
+    ))
+
+    if not vectors:
+        return store_neighbours('content', [], updated_at=started)
+    vocabulary = {term: i for i, term in enumerate(doc_counts)}
+    ids = np.array(list(vectors))
+    rows, cols, data = [], [], []
+    for row, vector in enumerate(vectors.values()):
+        for term, weight in vector.items():
+            rows.append(row)
+            cols.append(vocabulary[term])
+            data.append(weight)
+    matrix = sparse.csr_matrix((np.array(data, dtype=np.float32), (rows, cols)), shape=(len(ids), len(vocabulary)))
+    return store_neighbours('content', top_neighbours(matrix, ids, k=content_index.TOP_K), updated_at=started)
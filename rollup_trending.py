@@ -0,0 +1,69 @@
+import sys
+from collections import defaultdict
+from datetime import datetime, timedelta
+from app import app
+from database import db
+from models import Recipe, Rating, Comment, Bookmark, Rollup
+from sqlalchemy import select, union_all, literal, bindparam, case
+
+# How much one event adds to a recipe's score before it starts to decay
+EVENT_WEIGHTS = {'rating': 1.0, 'comment': 2.0, 'bookmark': 3.0}
+# Scores that have decayed below this are snapped to 0 so idle recipes stop being rewritten
+MIN_SCORE = 0.01
+
+def recent_events(since, until):
+    """(recipe_id, created_at, weight) of every rating, comment and bookmark in (since, until]"""
+    def events(model, kind):
+        query = select(model.recipe_id, model.created_at, literal(EVENT_WEIGHTS[kind]).label('weight'))
+        if since is not None:
+            query = query.where(model.created_at > since)
+        return query.where(model.created_at <= until)
+    return db.session.execute(union_all(
+        events(Rating, 'rating'), events(Comment, 'comment'), events(Bookmark, 'bookmark')
+    )).all()
+
+def rollup_trending(rebuild=False):
+    """Decay every trending score to now and add the events since the last run.
+
+    A score is the sum of weight * 0.5 ** (age / half-life) over a recipe's
+    events, so moving all scores forward in time is one multiplication and
+    each run only has to read the events created since the previous one.
+    --rebuild (and the first run) recomputes from the last ten half-lives of
+    events instead, which also drops deleted ones.
+    """
+    with app.app_context():
+        now = datetime.utcnow()
+        half_life = timedelta(hours=app.config['TRENDING_HALF_LIFE_HOURS'])
+        state = db.session.get(Rollup, 'trending')
+
+        if rebuild or state is None:
+            since = now - 10 * half_life
+            db.session.execute(Recipe.update_quietly(Recipe.trending_score != 0, trending_score=0))
+        else:
+            since = state.ran_at
+            factor = 0.5 ** ((now - since) / half_life)
+            decayed = Recipe.trending_score * factor
+            db.session.execute(Recipe.update_quietly(
+                Recipe.trending_score > 0, trending_score=case((decayed < MIN_SCORE, 0.0), else_=decayed)
+            ))
+
+        increments = defaultdict(float)
+        for recipe_id, created_at, weight in recent_events(since, now):
+            increments[recipe_id] += weight * 0.5 ** ((now - created_at) / half_life)
+        if increments:
+            db.session.execute(
+                Recipe.update_quietly(
+                    Recipe.id == bindparam('recipe_id'), trending_score=Recipe.trending_score + bindparam('increment')
+                ),
+                [{'recipe_id': recipe_id, 'increment': increment} for recipe_id, increment in increments.items()]
+            )
+
+        if state is None:
+            db.session.add(Rollup(name='trending', ran_at=now))
+        else:
+            state.ran_at = now
+        db.session.commit()
+        print(f"Rolled up {len(increments)} active recipes")
+
+if __name__ == '__main__':
+    rollup_trending(rebuild='--rebuild' in sys.argv[1:])
@@ -2,28 +2,50 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from database import db
 from models import Bookmark, Recipe
+from utils import paginate, page_response, get_recipe_fields
+from sqlalchemy.orm import joinedload
 
 bookmarks_bp = Blueprint('bookmarks', __name__)
 
+MAX_CHECK_IDS = 100
+
 @bookmarks_bp.route('', methods=['GET'])
 @jwt_required()
 def get_user_bookmarks():
     """Get all bookmarks for the current user"""
     try:
         user_id = int(get_jwt_identity())
-        bookmarks = Bookmark.query.filter_by(user_id=user_id).all()
+        fields = get_recipe_fields()
+        
+        # Bookmarks and their full recipes (with authors) come back in one
+        # joined query, newest bookmark first, so the frontend gets
+        # everything it needs in one call
+        query = db.session.query(
+            Recipe,
+            Bookmark.created_at.label('bookmarked_at'),
+            Bookmark.id.label('bookmark_id')
+        ).join(
+            Bookmark, Bookmark.recipe_id == Recipe.id
+        ).filter(
+            Bookmark.user_id == user_id
+        ).options(joinedload(Recipe.user), *Recipe.field_options(fields))
+        
+        rows, next_cursor = paginate(
+            query,
+            [Bookmark.created_at, Bookmark.id],
+            lambda row: (row.bookmarked_at, row.bookmark_id),
+            descending=True
+        )
         
-        # Fetch the full recipe details for each bookmarked recipe
-        # This way the frontend gets everything it needs in one call
         recipes = []
-        for bookmark in bookmarks:
-            recipe = Recipe.query.get(bookmark.recipe_id)
-            if recipe:
-                recipe_data = recipe.to_dict(include_stats=True)
-                recipe_data['bookmarked_at'] = bookmark.created_at.isoformat()
-                recipes.append(recipe_data)
-        
-        return jsonify(recipes), 200
+        for recipe, bookmarked_at, bookmark_id in rows:
+            recipe_data = recipe.to_dict(include_stats=True, fields=fields)
+            recipe_data['bookmarked_at'] = bookmarked_at.isoformat()
+            recipes.append(recipe_data)
+        
+        return page_response(recipes, next_cursor), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -86,6 +108,33 @@ def remove_bookmark(recipe_id):
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+@bookmarks_bp.route('/check', methods=['GET'])
+@jwt_required()
+def check_bookmarks():
+    """Check which of several recipes (?recipe_ids=1,2,3) are bookmarked by the current user"""
+    try:
+        user_id = int(get_jwt_identity())
+        
+        try:
+            recipe_ids = {int(i) for i in request.args.get('recipe_ids', '').split(',') if i.strip()}
+        except ValueError:
+            return jsonify({'error': 'recipe_ids must be a comma-separated list of integers'}), 400
+        if len(recipe_ids) > MAX_CHECK_IDS:
+            return jsonify({'error': f'At most {MAX_CHECK_IDS} recipe_ids per request'}), 400
+        
+        bookmarked = set()
+        if recipe_ids:
+            # Answered from the (user_id, recipe_id) unique index
+            rows = db.session.query(Bookmark.recipe_id).filter(
+                Bookmark.user_id == user_id,
+                Bookmark.recipe_id.in_(recipe_ids)
+            ).all()
+            bookmarked = {recipe_id for recipe_id, in rows}
+        
+        return jsonify({'bookmarked': sorted(bookmarked)}), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @bookmarks_bp.route('/check/<int:recipe_id>', methods=['GET'])
 @jwt_required()
 def check_bookmark(recipe_id):
@@ -2,16 +2,36 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from database import db
 from models import Comment, Recipe
+from utils import paginate, page_response, conditional
+from serializers import comment_serializer
+from cache import response_cache
 
 comments_bp = Blueprint('comments', __name__)
 
+def _comments_validators(recipe_id):
+    # Every comment write bumps the recipe's version, so it versions the comment list too
+    found = Recipe.get_validators(recipe_id)
+    if found is None:
+        return None
+    etag, last_modified = found
+    return f'comments-{etag}', last_modified
+
 @comments_bp.route('/recipe/<int:recipe_id>', methods=['GET'])
+@conditional(lambda recipe_id: _comments_validators(recipe_id))
+@response_cache.cached(tags=lambda recipe_id: [f'comments:{recipe_id}'])
 def get_recipe_comments(recipe_id):
     """Get all comments for a specific recipe"""
     try:
         recipe = Recipe.query.get_or_404(recipe_id)
-        comments = Comment.query.filter_by(recipe_id=recipe_id).order_by(Comment.created_at.desc()).all()
-        return jsonify([comment.to_dict() for comment in comments]), 200
+        rows, next_cursor = paginate(
+            comment_serializer.query().filter(Comment.recipe_id == recipe_id),
+            [Comment.created_at, Comment.id],
+            lambda row: (row.created_at, row.id),
+            descending=True
+        )
+        return page_response(comment_serializer.many(rows), next_cursor), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -36,7 +56,9 @@ def create_comment():
         )
         
         db.session.add(comment)
+        Recipe.adjust_stats(recipe.id, comment_count=1)
         db.session.commit()
+        response_cache.invalidate('recipes', f'recipe:{recipe.id}', f'comments:{recipe.id}')
         
         return jsonify(comment.to_dict()), 201
     except Exception as e:
@@ -58,7 +80,9 @@ def update_comment(comment_id):
         if 'content' in data:
             comment.content = data['content']
         
+        Recipe.touch(comment.recipe_id)
         db.session.commit()
+        response_cache.invalidate(f'comments:{comment.recipe_id}')
         return jsonify(comment.to_dict()), 200
     except Exception as e:
         db.session.rollback()
@@ -75,8 +99,10 @@ def delete_comment(comment_id):
         if comment.user_id != user_id:
             return jsonify({'error': 'Unauthorized'}), 403
         
+        Recipe.adjust_stats(comment.recipe_id, comment_count=-1)
         db.session.delete(comment)
         db.session.commit()
+        response_cache.invalidate('recipes', f'recipe:{comment.recipe_id}', f'comments:{comment.recipe_id}')
         return jsonify({'message': 'Comment deleted successfully'}), 200
     except Exception as e:
         db.session.rollback()
@@ -2,24 +2,37 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from database import db
 from models import Group, GroupMember, User, Recipe, GroupInvitation
+from utils import (paginate, page_response, attach_viewer_state, conditional,
+                   get_recipe_fields, is_streaming, stream_response)
+from sqlalchemy import or_
+from sqlalchemy.orm import joinedload
+from serializers import group_serializer, recipe_serializer, with_sort_keys
 import cloudinary.uploader
 
 groups_bp = Blueprint('groups', __name__)
 
 @groups_bp.route('', methods=['GET'])
 def get_all_groups():
-    groups = Group.query.all()
-    return jsonify([group.to_dict() for group in groups]), 200
+    try:
+        rows, next_cursor = paginate(
+            group_serializer.query(),
+            [Group.created_at, Group.id],
+            lambda row: (row.created_at, row.id),
+            descending=True
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return page_response(group_serializer.many(rows), next_cursor), 200
 
 @groups_bp.route('/my-groups', methods=['GET'])
 @jwt_required()
 def get_my_groups():
     user_id = int(get_jwt_identity())
-    created_groups = Group.query.filter_by(created_by=user_id).all()
-    memberships = GroupMember.query.filter_by(user_id=user_id).all()
-    member_groups = [Group.query.get(m.group_id) for m in memberships]
-    all_groups = {g.id: g.to_dict() for g in created_groups + member_groups if g}
-    return jsonify(list(all_groups.values())), 200
+    member_of = db.session.query(GroupMember.group_id).filter_by(user_id=user_id)
+    rows = group_serializer.query().filter(
+        or_(Group.created_by == user_id, Group.id.in_(member_of))
+    ).order_by(Group.id).all()
+    return jsonify(group_serializer.many(rows)), 200
 
 @groups_bp.route('', methods=['POST'])
 @jwt_required()
@@ -45,6 +58,7 @@ def create_group():
 
 @groups_bp.route('/<int:group_id>', methods=['GET'])
 @jwt_required()
+@conditional(Group.get_validators)
 def get_group(group_id):
     group = Group.query.get_or_404(group_id)
     return jsonify(group.to_dict()), 200
@@ -65,6 +79,7 @@ def upload_group_image(group_id):
     result = cloudinary.uploader.upload(image)
     
     group.image_url = result['secure_url']
+    group.version = Group.version + 1
     db.session.commit()
     
     return jsonify({'image_url': result['secure_url']}), 200
@@ -81,6 +96,7 @@ def join_group(group_id):
     
     member = GroupMember(group_id=group_id, user_id=user_id, role='member')
     db.session.add(member)
+    Group.touch(group_id)
     db.session.commit()
     
     return jsonify(member.to_dict()), 201
@@ -89,15 +105,29 @@ def join_group(group_id):
 @jwt_required()
 def get_group_members(group_id):
     group = Group.query.get_or_404(group_id)
-    members = GroupMember.query.filter_by(group_id=group_id).all()
+    members = GroupMember.query.filter_by(group_id=group_id).options(joinedload(GroupMember.user)).all()
     return jsonify([member.to_dict() for member in members]), 200
 
 @groups_bp.route('/<int:group_id>/recipes', methods=['GET'])
 @jwt_required()
 def get_group_recipes(group_id):
     group = Group.query.get_or_404(group_id)
-    recipes = Recipe.query.filter_by(group_id=group_id).all()
-    return jsonify([recipe.to_dict(include_stats=True) for recipe in recipes]), 200
+    serializer = recipe_serializer(get_recipe_fields())
+    viewer_id = int(get_jwt_identity())
+    keys = [Recipe.created_at, Recipe.id]
+    query, key = with_sort_keys(serializer.query().filter(Recipe.group_id == group_id), keys)
+    
+    def serialize(rows):
+        return attach_viewer_state(serializer.many(rows), viewer_id)
+    
+    if is_streaming():
+        return stream_response(query, keys, True, serialize)
+    
+    try:
+        rows, next_cursor = paginate(query, keys, key, descending=True)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return page_response(serialize(rows), next_cursor), 200
 
 @groups_bp.route('/<int:group_id>/invite', methods=['POST'])
 @jwt_required()
@@ -130,7 +160,7 @@ def get_my_invitations():
     invitations = GroupInvitation.query.filter_by(
         invitee_email=user.email,
         status='pending'
-    ).all()
+    ).options(joinedload(GroupInvitation.group), joinedload(GroupInvitation.inviter)).all()
     
     return jsonify([inv.to_dict() for inv in invitations]), 200
 
@@ -144,6 +174,7 @@ def accept_invitation(invitation_id):
     db.session.add(member)
     
     invitation.status = 'accepted'
+    Group.touch(invitation.group_id)
     db.session.commit()
     
     return jsonify({'message': 'Invitation accepted'}), 200
@@ -2,6 +2,7 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from database import db
 from models import Payment, User
+from utils import paginate, page_response
 import requests
 import os
 import base64
@@ -125,12 +126,20 @@ def verify_payment(transaction_id):
 @jwt_required()
 def payment_history():
     user_id = int(get_jwt_identity())
-    payments = Payment.query.filter_by(user_id=user_id).all()
+    try:
+        payments, next_cursor = paginate(
+            Payment.query.filter_by(user_id=user_id),
+            [Payment.created_at, Payment.id],
+            lambda payment: (payment.created_at, payment.id),
+            descending=True
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
-    return jsonify([{
+    return page_response([{
         'id': p.id,
         'amount': p.amount,
         'currency': p.currency,
         'status': p.status,
         'created_at': p.created_at.isoformat()
-    } for p in payments]), 200
+    } for p in payments], next_cursor), 200
@@ -2,6 +2,8 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from database import db
 from models import Rating, Recipe
+from serializers import rating_serializer
+from cache import response_cache
 
 ratings_bp = Blueprint('ratings', __name__)
 
@@ -10,15 +12,12 @@ def get_recipe_ratings(recipe_id):
     """Get all ratings for a specific recipe"""
     try:
         recipe = Recipe.query.get_or_404(recipe_id)
-        ratings = Rating.query.filter_by(recipe_id=recipe_id).all()
-        
-        avg_rating = recipe.get_avg_rating()
-        rating_count = len(ratings)
+        rows = rating_serializer.query().filter(Rating.recipe_id == recipe_id).all()
         
         return jsonify({
-            'avg_rating': round(avg_rating, 1),
-            'rating_count': rating_count,
-            'ratings': [rating.to_dict() for rating in ratings]
+            'avg_rating': round(recipe.avg_rating, 1),
+            'rating_count': recipe.rating_count,
+            'ratings': rating_serializer.many(rows)
         }), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -50,9 +49,11 @@ def create_or_update_rating():
         ).first()
         
         if existing_rating:
-            # Update existing rating
+            # Update existing rating, moving the stored sum by the difference
+            Recipe.adjust_stats(recipe.id, rating_sum=rating_value - existing_rating.rating)
             existing_rating.rating = rating_value
             db.session.commit()
+            response_cache.invalidate('recipes', f'recipe:{recipe.id}')
             return jsonify(existing_rating.to_dict()), 200
         else:
             # Create new rating
@@ -62,7 +63,9 @@ def create_or_update_rating():
                 user_id=user_id
             )
             db.session.add(rating)
+            Recipe.adjust_stats(recipe.id, rating_sum=rating_value, rating_count=1)
             db.session.commit()
+            response_cache.invalidate('recipes', f'recipe:{recipe.id}')
             return jsonify(rating.to_dict()), 201
     except Exception as e:
         db.session.rollback()
@@ -79,8 +82,10 @@ def delete_rating(rating_id):
         if rating.user_id != user_id:
             return jsonify({'error': 'Unauthorized'}), 403
         
+        Recipe.adjust_stats(rating.recipe_id, rating_sum=-rating.rating, rating_count=-1)
         db.session.delete(rating)
         db.session.commit()
+        response_cache.invalidate('recipes', f'recipe:{rating.recipe_id}')
         return jsonify({'message': 'Rating deleted successfully'}), 200
     except Exception as e:
         db.session.rollback()
@@ -1,48 +1,130 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from database import db
-from models import Recipe, User
-from sqlalchemy import or_, and_, func
+from models import Recipe, User, Rating, Bookmark, RecipeSimilarity
+from sqlalchemy import or_, and_, func, cast, Numeric, select, union, null
+from search import search_scores
+from serializers import recipe_serializer, with_sort_keys
+from ingredients import ingredient_filter
+from diet import excluded_flags
+from countries import resolve_country
+from facets import facet_counts
+from content_index import index_recipe, unindex_recipe, recipe_term_counts
+from suggest import suggest_index, DEFAULT_LIMIT, MAX_LIMIT
+from fuzzy import index_trigrams, unindex_trigrams
+from pantry import pantry_index, MAX_PANTRY_ITEMS
+from cache import response_cache
+from utils import (paginate, page_response, attach_viewer_state, get_viewer_id, conditional,
+                   get_recipe_fields, is_streaming, stream_response, get_page_limit)
 
 recipes_bp = Blueprint('recipes', __name__)
 
 @recipes_bp.route('', methods=['GET'])
+@response_cache.cached(tags=['recipes'])
 def get_recipes():
     search = request.args.get('search', '').strip()
     country = request.args.get('country', '').strip()
     min_rating = request.args.get('min_rating', type=float)
     max_servings = request.args.get('max_servings', type=int)
+    min_servings = request.args.get('min_servings', type=int)
+    max_total_time = request.args.get('max_total_time', type=int)
+    max_prep_time = request.args.get('max_prep_time', type=int)
     ingredient = request.args.get('ingredient', '').strip()
-    sort_by = request.args.get('sort_by', 'created_at')
+    diets = [name.strip().lower() for name in request.args.get('diet', '').split(',') if name.strip()]
+    excludes = [name.strip().lower() for name in request.args.get('exclude', '').split(',') if name.strip()]
+    sort_by = request.args.get('sort_by', 'relevance' if search else 'created_at')
+    with_facets = request.args.get('facets', '').lower() in ('1', 'true')
+    fields = get_recipe_fields()
     
-    query = Recipe.query
+    # Plain column rows with the author joined in; stats are columns on Recipe
+    serializer = recipe_serializer(fields)
+    query = serializer.query()
     
-    if search:
-        query = query.filter(Recipe.title.ilike(f'%{search}%'))
+    if ingredient:
+        try:
+            query = query.filter(ingredient_filter(ingredient))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+    
+    if diets or excludes:
+        try:
+            mask = excluded_flags(diets, excludes)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        query = query.filter(Recipe.diet_flags.op('&')(mask) == 0)
+    
+    scores = search_scores(search) if search else None
+    if scores is not None:
+        query = query.join(scores, scores.c.recipe_id == Recipe.id).add_columns(scores.c.score.label('search_score'))
     
     if country:
-        query = query.filter(Recipe.country.ilike(f'%{country}%'))
+        # A country name, alias or ISO code is an equality range on the
+        # ix_recipes_country_code_* indexes; anything else (a region, a
+        # fragment) falls back to a substring match on the free text
+        country_code = resolve_country(country)
+        if country_code:
+            query = query.filter(Recipe.country_code == country_code)
+        else:
+            query = query.filter(Recipe.country.ilike(f'%{country}%'))
     
     if max_servings:
         query = query.filter(Recipe.servings <= max_servings)
     
-    if ingredient:
-        query = query.filter(Recipe.ingredients.ilike(f'%{ingredient}%'))
+    if min_servings:
+        query = query.filter(Recipe.servings >= min_servings)
+    
+    # Range scans on ix_recipes_total_time / ix_recipes_country_code_total_time
+    if max_total_time is not None:
+        query = query.filter(Recipe.total_time <= max_total_time)
     
-    recipes = query.all()
-    recipes_data = [recipe.to_dict(include_stats=True) for recipe in recipes]
+    if max_prep_time is not None:
+        query = query.filter(Recipe.prep_time <= max_prep_time)
     
     if min_rating:
-        recipes_data = [r for r in recipes_data if r['avg_rating'] >= min_rating]
+        query = query.filter(func.round(cast(Recipe.avg_rating, Numeric), 1) >= min_rating)
     
-    if sort_by == 'rating':
-        recipes_data.sort(key=lambda x: x['avg_rating'], reverse=True)
+    facets = None
+    if with_facets and not is_streaming():
+        filtered = (search or country or ingredient or diets or excludes or min_rating or max_servings
+                    or min_servings or max_total_time is not None or max_prep_time is not None)
+        if filtered:
+            facets = facet_counts(query)
+        else:
+            # The browse page's counts; cached for signed-in viewers too since they don't vary by user
+            facets = response_cache.memoize('facets:recipes', ['recipes'], lambda: facet_counts(query))
+    
+    # Recipe.id breaks ties so the order, and therefore the cursor, is stable
+    if sort_by == 'relevance' and scores is not None:
+        keys, descending = [scores.c.score, Recipe.id], True
+    elif sort_by == 'rating':
+        keys, descending = [Recipe.bayes_score, Recipe.id], True
     elif sort_by == 'title':
-        recipes_data.sort(key=lambda x: x['title'])
+        keys, descending = [Recipe.title, Recipe.id], False
+    elif sort_by == 'trending':
+        keys, descending = [Recipe.trending_score, Recipe.id], True
     else:
-        recipes_data.sort(key=lambda x: x['created_at'], reverse=True)
+        keys, descending = [Recipe.created_at, Recipe.id], True
+    query, key = with_sort_keys(query, keys)
     
-    return jsonify(recipes_data), 200
+    viewer_id = get_viewer_id()
+    
+    def serialize(rows):
+        recipes_data = serializer.many(rows)
+        if scores is not None:
+            for recipe_data, row in zip(recipes_data, rows):
+                recipe_data['search_score'] = row.search_score
+        return attach_viewer_state(recipes_data, viewer_id)
+    
+    if is_streaming():
+        return stream_response(query, keys, descending, serialize)
+    
+    try:
+        rows, next_cursor = paginate(query, keys, key, descending)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    extra = {'facets': facets} if facets is not None else {}
+    return page_response(serialize(rows), next_cursor, **extra), 200
 
 @recipes_bp.route('', methods=['POST'])
 @jwt_required()
@@ -67,14 +149,61 @@ def create_recipe():
         )
         
         db.session.add(recipe)
+        db.session.flush()
+        index_recipe(recipe)
+        index_trigrams(recipe)
         db.session.commit()
+        response_cache.invalidate('recipes')
+        suggest_index.add_recipe(recipe)
+        pantry_index.add_recipe(recipe)
         
         return jsonify(recipe.to_dict()), 201
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+@recipes_bp.route('/suggest', methods=['GET'])
+def suggest_recipes():
+    """Typeahead suggestions (recipes, ingredients, countries) for a prefix"""
+    limit = max(1, min(request.args.get('limit', DEFAULT_LIMIT, type=int), MAX_LIMIT))
+    suggest_index.refresh_if_stale(current_app.config['SUGGEST_REFRESH_SECONDS'])
+    return jsonify(suggest_index.suggest(request.args.get('q', ''), limit)), 200
+
+@recipes_bp.route('/pantry', methods=['GET'])
+def pantry_recipes():
+    """Recipes ranked by how many of their ingredients the given pantry covers"""
+    try:
+        pantry = [item.strip() for item in request.args.get('ingredients', '').split(',') if item.strip()]
+        if not pantry:
+            return jsonify({'error': 'ingredients is required'}), 400
+        if len(pantry) > MAX_PANTRY_ITEMS:
+            return jsonify({'error': f'At most {MAX_PANTRY_ITEMS} ingredients'}), 400
+        max_missing = request.args.get('max_missing', type=int)
+        pantry_index.refresh_if_stale(current_app.config['PANTRY_REFRESH_SECONDS'])
+        
+        serializer = recipe_serializer(Recipe.SUMMARY_FIELDS)
+        while True:
+            ranked = pantry_index.rank(pantry, get_page_limit(), max_missing)
+            rows = serializer.query().filter(Recipe.id.in_([recipe_id for recipe_id, _, _ in ranked])).all()
+            by_id = {row.id: serializer.dump(row) for row in rows}
+            gone = [recipe_id for recipe_id, _, _ in ranked if recipe_id not in by_id]
+            if not gone:
+                break
+            # Deleted by another worker since this index was built; rank again without them
+            for recipe_id in gone:
+                pantry_index.remove_recipe(recipe_id)
+        
+        recipes_data = [
+            dict(by_id[recipe_id], matched=matched, missing=len(missing), missing_ingredients=missing)
+            for recipe_id, matched, missing in ranked
+        ]
+        return jsonify(recipes_data), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @recipes_bp.route('/<int:recipe_id>', methods=['GET'])
+@conditional(Recipe.get_validators)
+@response_cache.cached(tags=lambda recipe_id: [f'recipe:{recipe_id}'])
 def get_recipe(recipe_id):
     try:
         recipe = Recipe.query.get_or_404(recipe_id)
@@ -93,6 +222,8 @@ def update_recipe(recipe_id):
             return jsonify({'error': 'Unauthorized'}), 403
         
         data = request.get_json()
+        reindex = any(field in data for field in ('title', 'description', 'ingredients'))
+        previous_terms = recipe_term_counts(recipe) if reindex else None
         if 'title' in data:
             recipe.title = data['title']
         if 'description' in data:
@@ -114,7 +245,16 @@ def update_recipe(recipe_id):
         if 'is_premium' in data:
             recipe.is_premium = data['is_premium']
         
+        recipe.version = Recipe.version + 1
+        if reindex:
+            index_recipe(recipe, previous_terms)
+        if 'title' in data or 'ingredients' in data:
+            db.session.flush()
+            index_trigrams(recipe)
         db.session.commit()
+        response_cache.invalidate('recipes', f'recipe:{recipe_id}')
+        suggest_index.add_recipe(recipe)
+        pantry_index.add_recipe(recipe)
         return jsonify(recipe.to_dict()), 200
     except Exception as e:
         db.session.rollback()
@@ -130,17 +270,101 @@ def delete_recipe(recipe_id):
         if recipe.user_id != user_id:
             return jsonify({'error': 'Unauthorized'}), 403
         
+        unindex_recipe(recipe)
+        unindex_trigrams(recipe_id)
         db.session.delete(recipe)
         db.session.commit()
+        response_cache.invalidate('recipes', f'recipe:{recipe_id}', f'comments:{recipe_id}')
+        suggest_index.remove_recipe(recipe_id)
+        pantry_index.remove_recipe(recipe_id)
         return jsonify({'message': 'Recipe deleted successfully'}), 200
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+def _neighbour_recipes(recipe_id, source):
+    # One range scan of ix_recipe_similarities_lookup joined to the recipe summaries
+    serializer = recipe_serializer(Recipe.SUMMARY_FIELDS)
+    rows = serializer.query(RecipeSimilarity.score).join(
+        RecipeSimilarity, RecipeSimilarity.similar_recipe_id == Recipe.id
+    ).filter(
+        RecipeSimilarity.recipe_id == recipe_id, RecipeSimilarity.source == source
+    ).order_by(RecipeSimilarity.score.desc(), Recipe.id).limit(get_page_limit()).all()
+    
+    recipes_data = serializer.many(rows)
+    for recipe_data, row in zip(recipes_data, rows):
+        recipe_data['score'] = row.score
+    return jsonify(recipes_data), 200
+
+@recipes_bp.route('/<int:recipe_id>/also-liked', methods=['GET'])
+@response_cache.cached(tags=lambda recipe_id: ['recipes', f'recipe:{recipe_id}'])
+def get_also_liked(recipe_id):
+    """Recipes liked by the same people, from the precomputed neighbour table"""
+    return _neighbour_recipes(recipe_id, 'cf')
+
+@recipes_bp.route('/<int:recipe_id>/similar', methods=['GET'])
+@response_cache.cached(tags=lambda recipe_id: ['recipes', f'recipe:{recipe_id}'])
+def get_similar(recipe_id):
+    """Recipes with similar titles, descriptions and ingredients (TF-IDF)"""
+    return _neighbour_recipes(recipe_id, 'content')
+
+@recipes_bp.route('/feed', methods=['GET'])
+@jwt_required()
+def get_feed():
+    """Recipes similar to the ones the current user rated highly or bookmarked"""
+    user_id = int(get_jwt_identity())
+    serializer = recipe_serializer(Recipe.SUMMARY_FIELDS)
+    limit = get_page_limit()
+    
+    liked = union(
+        select(Rating.recipe_id).where(Rating.user_id == user_id, Rating.rating > Rating.NEUTRAL),
+        select(Bookmark.recipe_id).where(Bookmark.user_id == user_id)
+    )
+    seen = union(
+        select(Rating.recipe_id).where(Rating.user_id == user_id),
+        select(Bookmark.recipe_id).where(Bookmark.user_id == user_id)
+    )
+    # Each liked recipe votes for its neighbours with their similarity
+    candidates = db.session.query(
+        RecipeSimilarity.similar_recipe_id.label('recipe_id'),
+        func.sum(RecipeSimilarity.score).label('score')
+    ).filter(
+        RecipeSimilarity.source == 'cf',
+        RecipeSimilarity.recipe_id.in_(liked),
+        RecipeSimilarity.similar_recipe_id.not_in(seen)
+    ).group_by(RecipeSimilarity.similar_recipe_id).subquery()
+    
+    rows = serializer.query(candidates.c.score).join(
+        candidates, candidates.c.recipe_id == Recipe.id
+    ).order_by(candidates.c.score.desc(), Recipe.id).limit(limit).all()
+    if not rows:
+        # Nothing to go on yet: the most rated recipes the user hasn't seen
+        rows = serializer.query(null().label('score')).filter(Recipe.id.not_in(seen)).order_by(
+            Recipe.rating_count.desc(), Recipe.id
+        ).limit(limit).all()
+    
+    recipes_data = serializer.many(rows)
+    for recipe_data, row in zip(recipes_data, rows):
+        recipe_data['score'] = row.score
+    return jsonify(recipes_data), 200
+
 @recipes_bp.route('/user/<int:user_id>', methods=['GET'])
 def get_user_recipes(user_id):
     try:
-        recipes = Recipe.query.filter_by(user_id=user_id).all()
-        return jsonify([recipe.to_dict() for recipe in recipes]), 200
+        serializer = recipe_serializer(get_recipe_fields())
+        viewer_id = get_viewer_id()
+        keys = [Recipe.created_at, Recipe.id]
+        query, key = with_sort_keys(serializer.query().filter(Recipe.user_id == user_id), keys)
+        
+        def serialize(rows):
+            return attach_viewer_state(serializer.many(rows), viewer_id)
+        
+        if is_streaming():
+            return stream_response(query, keys, True, serialize)
+        
+        rows, next_cursor = paginate(query, keys, key, descending=True)
+        return page_response(serialize(rows), next_cursor), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
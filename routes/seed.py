@@ -2,6 +2,11 @@ from flask import Blueprint, jsonify
 from database import db
 from models import User, Recipe
 from werkzeug.security import generate_password_hash
+from content_index import index_recipe
+from fuzzy import index_trigrams
+from suggest import suggest_index
+from pantry import pantry_index
+from cache import response_cache
 
 seed_bp = Blueprint('seed', __name__)
 
@@ -82,13 +87,23 @@ def seed_recipes():
             {'title': 'Chicken Tagine', 'description': 'Moroccan slow-cooked stew with preserved lemons', 'ingredients': 'Chicken\nPreserved lemons\nOlives\nSpices\nOnions', 'instructions': '1. Brown chicken\n2. Add spices\n3. Add lemons and olives\n4. Simmer', 'prep_time': 15, 'cook_time': 60, 'servings': 4, 'country': 'Morocco', 'image_url': 'https://images.unsplash.com/photo-1598103442097-8b74394b95c6?w=600', 'user_id': users['Morocco'].id},
         ]
         
+        # The same index hooks as create_recipe, so seeded recipes are searchable and suggested
+        seeded = []
         for recipe_data in new_recipes:
             existing = Recipe.query.filter_by(title=recipe_data['title']).first()
             if not existing:
                 recipe = Recipe(**recipe_data)
                 db.session.add(recipe)
+                db.session.flush()
+                index_recipe(recipe)
+                index_trigrams(recipe)
+                seeded.append(recipe)
         
         db.session.commit()
+        response_cache.invalidate('recipes')
+        for recipe in seeded:
+            suggest_index.add_recipe(recipe)
+            pantry_index.add_recipe(recipe)
         return jsonify({'message': 'Recipes seeded successfully'}), 200
     except Exception as e:
         db.session.rollback()
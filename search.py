@@ -0,0 +1,165 @@
+"""Full-text search over recipe title, description and ingredients.
+
+SQLite gets an FTS5 external-content table that triggers keep in sync with
+``recipes``; Postgres gets a generated ``tsvector`` column with a GIN index.
+Either way the database maintains the index on every insert/update/delete,
+including the seed scripts, and ``search_scores(q)`` returns a subquery of
+``(recipe_id, score)`` where a higher score means a better match.
+"""
+import re
+from sqlalchemy import text, select, and_, or_, literal, Integer, Float
+from database import db
+from fuzzy import fuzzy_scores
+
+_WORD = re.compile(r'\w+', re.UNICODE)
+MAX_TERMS = 16
+
+def _terms(q):
+    return _WORD.findall(q.lower())[:MAX_TERMS]
+
+class SqliteFtsBackend:
+    name = 'sqlite-fts5'
+
+    DDL = [
+        """CREATE VIRTUAL TABLE IF NOT EXISTS recipes_fts USING fts5(
+            title, description, ingredients,
+            content='recipes', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        )""",
+        """CREATE TRIGGER IF NOT EXISTS recipes_fts_insert AFTER INSERT ON recipes BEGIN
+            INSERT INTO recipes_fts(rowid, title, description, ingredients)
+            VALUES (new.id, new.title, new.description, new.ingredients);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS recipes_fts_delete AFTER DELETE ON recipes BEGIN
+            INSERT INTO recipes_fts(recipes_fts, rowid, title, description, ingredients)
+            VALUES ('delete', old.id, old.title, old.description, old.ingredients);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS recipes_fts_update AFTER UPDATE OF title, description, ingredients ON recipes BEGIN
+            INSERT INTO recipes_fts(recipes_fts, rowid, title, description, ingredients)
+            VALUES ('delete', old.id, old.title, old.description, old.ingredients);
+            INSERT INTO recipes_fts(rowid, title, description, ingredients)
+            VALUES (new.id, new.title, new.description, new.ingredients);
+        END""",
+    ]
+
+    def install(self, conn):
+        created = conn.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'recipes_fts'"
+        )).first() is None
+        for statement in self.DDL:
+            conn.execute(text(statement))
+        # An external-content index must hold every existing row before the
+        # triggers send it a 'delete' for one, or SQLite reports corruption
+        if created:
+            self.rebuild(conn)
+
+    def rebuild(self, conn):
+        conn.execute(text("INSERT INTO recipes_fts(recipes_fts) VALUES ('rebuild')"))
+
+    def scores(self, terms):
+        # Every term must match, each as a prefix so "chick" finds "chicken".
+        # bm25() is lower-is-better, so flip the sign; columns are weighted
+        # title > description > ingredients.
+        match = ' '.join(f'"{term}"*' for term in terms)
+        return text(
+            "SELECT rowid AS recipe_id, -bm25(recipes_fts, 10.0, 3.0, 1.0) AS score "
+            "FROM recipes_fts WHERE recipes_fts MATCH :match"
+        ).bindparams(match=match).columns(recipe_id=Integer, score=Float)
+
+class PostgresFtsBackend:
+    name = 'postgres-tsvector'
+
+    DDL = [
+        """ALTER TABLE recipes ADD COLUMN IF NOT EXISTS search_vector tsvector
+            GENERATED ALWAYS AS (
+                setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+                setweight(to_tsvector('english', coalesce(description, '')), 'B') ||
+                setweight(to_tsvector('english', coalesce(ingredients, '')), 'C')
+            ) STORED""",
+        "CREATE INDEX IF NOT EXISTS ix_recipes_search_vector ON recipes USING GIN (search_vector)",
+    ]
+
+    def install(self, conn):
+        for statement in self.DDL:
+            conn.execute(text(statement))
+
+    def rebuild(self, conn):
+        # The generated column is recomputed by Postgres on every write, so
+        # only the index itself can need rebuilding
+        conn.execute(text("REINDEX INDEX ix_recipes_search_vector"))
+
+    def scores(self, terms):
+        # ts_rank_cd weighs the A/B/C labels much like BM25 field weights
+        query = ' & '.join(f'{term}:*' for term in terms)
+        return text(
+            "SELECT id AS recipe_id, ts_rank_cd(search_vector, q, 32) AS score "
+            "FROM recipes, to_tsquery('english', :query) q WHERE search_vector @@ q"
+        ).bindparams(query=query).columns(recipe_id=Integer, score=Float)
+
+class LikeBackend:
+    """Unindexed fallback for databases without a full-text engine"""
+    name = 'like'
+
+    def install(self, conn):
+        pass
+
+    def rebuild(self, conn):
+        pass
+
+    def scores(self, terms):
+        from models import Recipe
+        return select(Recipe.id.label('recipe_id'), literal(1.0, Float).label('score')).where(and_(*[
+            or_(
+                Recipe.title.ilike(f'%{term}%'),
+                Recipe.description.ilike(f'%{term}%'),
+                Recipe.ingredients.ilike(f'%{term}%')
+            ) for term in terms
+        ]))
+
+_backend = None
+
+def _make_backend(dialect):
+    if dialect == 'sqlite':
+        return SqliteFtsBackend()
+    if dialect == 'postgresql':
+        return PostgresFtsBackend()
+    return LikeBackend()
+
+def init_search_index():
+    """Create the index and sync triggers if missing; call inside an app context"""
+    global _backend
+    backend = _make_backend(db.engine.dialect.name)
+    try:
+        with db.engine.begin() as conn:
+            backend.install(conn)
+    except Exception as e:
+        # e.g. a SQLite build without FTS5
+        print(f"Full-text search unavailable, falling back to LIKE: {e}")
+        backend = LikeBackend()
+    _backend = backend
+    return backend
+
+def get_backend():
+    return _backend or init_search_index()
+
+def rebuild_search_index():
+    backend = get_backend()
+    with db.engine.begin() as conn:
+        backend.rebuild(conn)
+    return backend
+
+def search_scores(q):
+    """Subquery of (recipe_id, score) for recipes matching every word in q, or None if q has no words.
+
+    When nothing matches exactly (usually a typo) the trigram index in
+    fuzzy.py is asked for close matches instead.
+    """
+    terms = _terms(q)
+    if not terms:
+        return None
+    scores = get_backend().scores(terms).subquery('search_scores')
+    if db.session.execute(select(scores.c.recipe_id).limit(1)).first() is None:
+        fuzzy = fuzzy_scores(q)
+        if fuzzy is not None:
+            return fuzzy
+    return scores
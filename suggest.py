@@ -0,0 +1,171 @@
+"""In-memory typeahead over recipe titles, ingredient names and countries.
+
+Every suggestion is stored under each of its word-start suffixes
+("chicken biryani" under "chicken biryani" and "biryani") in one sorted
+list, so the suggestions for a prefix are the contiguous slice found by two
+bisects. Suggestions are ranked by popularity: ratings + comments for a
+recipe, the number of recipes using an ingredient or from a country.
+
+When a prefix matches more than ``MAX_SCAN`` keys the slice is too long to
+rank, but then matches are common, so walking all suggestions from most to
+least popular finds the top ones after a short scan instead. Both paths
+return exactly the most popular matches.
+
+Built at startup (``suggest_index.rebuild()``) and kept current as described
+in live_index.py; ratings and comments don't touch it, so popularity, like
+other workers' recipes, catches up when the suggest route refreshes an index
+older than ``SUGGEST_REFRESH_SECONDS``.
+"""
+import bisect
+import heapq
+import re
+import unicodedata
+from collections import Counter
+from database import db
+from live_index import LiveIndex
+
+MAX_SCAN = 1000
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 20
+
+_NON_WORD = re.compile(r'[\W_]+')
+
+def normalize(text):
+    """Lower-cased, accent-free words separated by single spaces: what keys and queries are compared as"""
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    return _NON_WORD.sub(' ', text.lower()).strip()
+
+def _keys(label):
+    words = normalize(label).split(' ')
+    return tuple(dict.fromkeys(' '.join(words[i:]) for i in range(len(words)) if words[i]))
+
+class SuggestIndex(LiveIndex):
+    name = 'suggestion'
+
+    def __init__(self):
+        super().__init__()
+        self._entries = []     # sorted (key, -weight, kind, ref)
+        self._ranked = []      # sorted (-weight, kind, ref)
+        self._items = {}       # (kind, ref) -> [label, weight, keys, ' ' + normalized label]
+        self._recipes = {}     # recipe id -> (country, ingredient names) it counted towards
+
+    def _load(self):
+        from models import Recipe, RecipeIngredient
+        recipes = db.session.query(
+            Recipe.id, Recipe.title, Recipe.country, Recipe.rating_count + Recipe.comment_count
+        ).all()
+        ingredients = {}
+        for recipe_id, name in db.session.query(RecipeIngredient.recipe_id, RecipeIngredient.name).distinct():
+            ingredients.setdefault(recipe_id, set()).add(name)
+
+        items = {}
+        recipe_refs = {}
+        counts = Counter()
+        for recipe_id, title, country, activity in recipes:
+            items[('recipe', recipe_id)] = [title, 1 + (activity or 0)]
+            names = frozenset(ingredients.get(recipe_id, ()))
+            recipe_refs[recipe_id] = (country, names)
+            counts.update(('ingredient', name) for name in names)
+            if country:
+                counts[('country', country)] += 1
+        for (kind, label), count in counts.items():
+            items[(kind, label)] = [label, count]
+        for item in items.values():
+            item.extend((_keys(item[0]), ' ' + normalize(item[0])))
+
+        entries = sorted(
+            (key, -weight, kind, ref) for (kind, ref), (_, weight, keys, _) in items.items() for key in keys
+        )
+        ranked = sorted((-weight, kind, ref) for (kind, ref), (_, weight, _, _) in items.items())
+        return entries, ranked, items, recipe_refs
+
+    def _install(self, loaded):
+        self._entries, self._ranked, self._items, self._recipes = loaded
+        return len(self._items)
+
+    def add_recipe(self, recipe):
+        """Index a new or edited recipe (after commit); replaces what was indexed for it before"""
+        names = frozenset(item.name for item in recipe.ingredient_items)
+        weight = 1 + (recipe.rating_count or 0) + (recipe.comment_count or 0)
+        self._write(self._add_recipe, recipe.id, recipe.title, weight, recipe.country, names)
+
+    def remove_recipe(self, recipe_id):
+        self._write(self._remove_recipe, recipe_id)
+
+    def suggest(self, q, limit=DEFAULT_LIMIT):
+        """[{'type', 'text'(, 'id')}] of the most popular suggestions with a word starting with q"""
+        prefix = normalize(q)
+        if not prefix:
+            return []
+        with self._lock:
+            lo = bisect.bisect_left(self._entries, (prefix,))
+            hi = bisect.bisect_left(self._entries, (prefix + '\U0010ffff',))
+            if hi - lo <= MAX_SCAN:
+                # A set, since two words of one title can both start with the prefix
+                top = heapq.nsmallest(limit, {entry[1:] for entry in self._entries[lo:hi]})
+                found = [(kind, ref) for _, kind, ref in top]
+            else:
+                found = []
+                word_start = ' ' + prefix
+                for _, kind, ref in self._ranked:
+                    if word_start in self._items[(kind, ref)][3]:
+                        found.append((kind, ref))
+                        if len(found) == limit:
+                            break
+            results = []
+            for kind, ref in found:
+                result = {'type': kind, 'text': self._items[(kind, ref)][0]}
+                if kind == 'recipe':
+                    result['id'] = ref
+                results.append(result)
+        return results
+
+    # The helpers below expect self._lock to be held
+
+    def _add_recipe(self, recipe_id, title, weight, country, names):
+        self._remove_recipe(recipe_id)
+        self._recipes[recipe_id] = (country, names)
+        self._put(('recipe', recipe_id), title, weight)
+        for name in names:
+            self._count(('ingredient', name), 1)
+        if country:
+            self._count(('country', country), 1)
+
+    def _put(self, item, label, weight):
+        self._drop(item)
+        keys = _keys(label)
+        self._items[item] = [label, weight, keys, ' ' + normalize(label)]
+        for key in keys:
+            bisect.insort(self._entries, (key, -weight, *item))
+        bisect.insort(self._ranked, (-weight, *item))
+
+    def _drop(self, item):
+        entry = self._items.pop(item, None)
+        if entry is None:
+            return
+        _, weight, keys, _ = entry
+        for key in keys:
+            self._entries.pop(bisect.bisect_left(self._entries, (key, -weight, *item)))
+        self._ranked.pop(bisect.bisect_left(self._ranked, (-weight, *item)))
+
+    def _count(self, item, delta):
+        entry = self._items.get(item)
+        weight = (entry[1] if entry else 0) + delta
+        if weight > 0:
+            self._put(item, item[1], weight)
+        else:
+            self._drop(item)
+
+    def _remove_recipe(self, recipe_id):
+        previous = self._recipes.pop(recipe_id, None)
+        self._drop(('recipe', recipe_id))
+        if previous is None:
+            return
+        country, names = previous
+        for name in names:
+            self._count(('ingredient', name), -1)
+        if country:
+            self._count(('country', country), -1)
+
+suggest_index = SuggestIndex()
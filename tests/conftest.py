@@ -0,0 +1,44 @@
+import os
+import tempfile
+import pytest
+
+# Point the app at a throwaway database before it is imported (it creates its tables on import)
+_db_file = tempfile.NamedTemporaryFile(suffix='.db', delete=False)
+os.environ['DATABASE_URL'] = 'sqlite:///' + _db_file.name
+os.environ['CACHE_BACKEND'] = 'none'
+
+from app import app as flask_app
+from database import db
+from models import User, Country
+from suggest import suggest_index
+from pantry import pantry_index
+from fuzzy import rebuild_fuzzy_index
+from flask_jwt_extended import create_access_token
+
+@pytest.fixture
+def app():
+    flask_app.config['TESTING'] = True
+    with flask_app.app_context():
+        yield flask_app
+        db.session.rollback()
+        # The country reference rows are shared fixtures, everything else starts empty
+        for table in reversed(db.metadata.sorted_tables):
+            if table is not Country.__table__:
+                db.session.execute(table.delete())
+        db.session.commit()
+        # as do the indexes kept outside the models' tables
+        suggest_index.rebuild()
+        pantry_index.rebuild()
+        rebuild_fuzzy_index()
+
+@pytest.fixture
+def user(app):
+    user = User(username='cook', email='cook@example.com')
+    user.set_password('secret')
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+@pytest.fixture
+def auth_headers(user):
+    return {'Authorization': f'Bearer {create_access_token(identity=str(user.id))}'}
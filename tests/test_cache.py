@@ -0,0 +1,104 @@
+import pytest
+from flask import jsonify
+from cache import LRUBackend, ResponseCache
+
+def test_get_returns_what_was_set():
+    cache = LRUBackend()
+    cache.set('a', b'1', ['recipes'], 60)
+    assert cache.get('a') == b'1'
+    assert cache.get('missing') is None
+
+def test_least_recently_used_entry_is_evicted():
+    cache = LRUBackend(max_entries=2)
+    cache.set('a', b'1', [], 60)
+    cache.set('b', b'2', [], 60)
+    cache.get('a')
+    cache.set('c', b'3', [], 60)
+    assert cache.get('a') == b'1'
+    assert cache.get('b') is None
+    assert cache.get('c') == b'3'
+
+def test_byte_budget_evicts_oldest():
+    cache = LRUBackend(max_bytes=30)
+    cache.set('a', b'x' * 10, [], 60)
+    cache.set('b', b'x' * 10, [], 60)
+    cache.set('c', b'x' * 10, [], 60)
+    assert cache.get('a') is None
+    assert cache.stats()['memory_bytes'] <= 30
+
+def test_expired_entries_are_misses():
+    cache = LRUBackend()
+    cache.set('a', b'1', [], -1)
+    assert cache.get('a') is None
+    assert cache.stats()['entries'] == 0
+
+def test_invalidate_drops_only_tagged_entries():
+    cache = LRUBackend()
+    cache.set('list', b'1', ['recipes'], 60)
+    cache.set('one', b'2', ['recipes', 'recipe:1'], 60)
+    cache.set('other', b'3', ['recipes', 'recipe:2'], 60)
+    cache.set('groups', b'4', ['groups'], 60)
+    cache.invalidate(['recipe:1'])
+    assert cache.get('one') is None
+    assert cache.get('list') == b'1' and cache.get('other') == b'3'
+    cache.invalidate(['recipes'])
+    assert cache.get('list') is None and cache.get('other') is None
+    assert cache.get('groups') == b'4'
+
+def test_replacing_an_entry_keeps_byte_count_and_tags_right():
+    cache = LRUBackend()
+    cache.set('a', b'1234', ['old'], 60)
+    cache.set('a', b'12', ['new'], 60)
+    assert cache.stats()['memory_bytes'] == len('a') + 2
+    cache.invalidate(['old'])
+    assert cache.get('a') == b'12'
+    cache.invalidate(['new'])
+    assert cache.get('a') is None
+    assert cache.stats()['memory_bytes'] == 0
+
+@pytest.fixture
+def cached_app(app):
+    response_cache = ResponseCache()
+    app.config['CACHE_BACKEND'] = 'lru'
+    response_cache.init_app(app)
+    app.config['CACHE_BACKEND'] = 'none'
+    return response_cache
+
+def test_view_is_cached_until_its_tag_is_invalidated(app, cached_app):
+    calls = []
+
+    @cached_app.cached(tags=lambda item_id: [f'item:{item_id}'])
+    def view(item_id):
+        calls.append(item_id)
+        return jsonify({'id': item_id})
+
+    with app.test_request_context('/items/1?b=2&a=1'):
+        assert view(item_id=1).headers['X-Cache'] == 'MISS'
+    with app.test_request_context('/items/1?a=1&b=2'):
+        response = view(item_id=1)
+        assert response.headers['X-Cache'] == 'HIT'
+        assert response.get_json() == {'id': 1}
+    cached_app.invalidate('item:1')
+    with app.test_request_context('/items/1?a=1&b=2'):
+        assert view(item_id=1).headers['X-Cache'] == 'MISS'
+    assert calls == [1, 1]
+
+def test_signed_in_requests_bypass_the_cache(app, cached_app):
+    @cached_app.cached(tags=['items'])
+    def view():
+        return jsonify({'ok': True})
+
+    with app.test_request_context('/items', headers={'Authorization': 'Bearer x'}):
+        assert 'X-Cache' not in view().headers
+    assert cached_app.stats()['entries'] == 0
+
+def test_shared_invalidation_needs_a_shared_backend(cached_app):
+    # A script's per-process LRU is not the workers' cache, so there is nothing to invalidate
+    assert cached_app.invalidate_shared('recipes') is False
+
+    class SharedBackend(LRUBackend):
+        name = 'redis'
+    cached_app.backend = SharedBackend()
+    cached_app.backend.set('a', b'1', ['recipes'], 60)
+    assert cached_app.invalidate_shared('recipes') is True
+    assert cached_app.backend.get('a') is None
@@ -0,0 +1,82 @@
+import pytest
+from sqlalchemy import text
+from database import db
+from models import Recipe, Rating, User
+from cache import response_cache, LRUBackend
+from recompute_recipe_stats import recompute_recipe_stats
+from backfill_countries import backfill_countries
+from backfill_ingredients import backfill_ingredients
+from rollup_trending import rollup_trending
+
+@pytest.fixture
+def recipe(user):
+    recipe = Recipe(title='Jollof Rice', ingredients='rice', instructions='Cook', country='Ghana', user_id=user.id)
+    db.session.add(recipe)
+    db.session.commit()
+    return recipe
+
+@pytest.fixture
+def lru_cache():
+    response_cache.backend = LRUBackend()
+    yield response_cache
+    response_cache.backend = None
+
+def test_not_modified_for_current_etag(client, recipe, auth_headers):
+    response = client.get(f'/api/recipes/{recipe.id}')
+    etag = response.headers['ETag']
+    assert client.get(f'/api/recipes/{recipe.id}', headers={'If-None-Match': etag}).status_code == 304
+    client.put(f'/api/recipes/{recipe.id}', json={'title': 'Jollof'}, headers=auth_headers)
+    assert client.get(f'/api/recipes/{recipe.id}', headers={'If-None-Match': etag}).status_code == 200
+
+def test_cached_body_is_never_sent_with_a_newer_etag(client, recipe, lru_cache):
+    first = client.get(f'/api/recipes/{recipe.id}')
+    assert client.get(f'/api/recipes/{recipe.id}').headers['X-Cache'] == 'HIT'
+    # A write handled by another worker: the version moves, this worker's cache isn't told
+    with db.engine.begin() as conn:
+        conn.execute(text("UPDATE recipes SET title = 'Jollof', version = version + 1 WHERE id = :id"), {'id': recipe.id})
+    db.session.expire_all()
+    second = client.get(f'/api/recipes/{recipe.id}')
+    assert second.headers['ETag'] != first.headers['ETag']
+    assert second.headers['X-Cache'] == 'MISS'
+    assert second.get_json()['title'] == 'Jollof'
+
+def test_recompute_bumps_version_of_changed_recipes_only(recipe, user):
+    other = Recipe(title='Fufu', ingredients='cassava', instructions='Pound', user_id=user.id)
+    db.session.add(other)
+    db.session.commit()
+    # A rating written behind the counters' back
+    db.session.execute(Rating.__table__.insert(), [{'recipe_id': recipe.id, 'user_id': user.id, 'rating': 5}])
+    db.session.commit()
+    before = {r.id: (r.version, r.updated_at) for r in Recipe.query}
+
+    recompute_recipe_stats()
+    db.session.expire_all()
+
+    fixed = db.session.get(Recipe, recipe.id)
+    assert (fixed.rating_count, fixed.version, fixed.updated_at) == (1, before[recipe.id][0] + 1, before[recipe.id][1])
+    assert db.session.get(Recipe, other.id).version == before[other.id][0]
+
+def test_country_backfill_bumps_version(recipe):
+    with db.engine.begin() as conn:
+        conn.execute(text("UPDATE recipes SET country_code = NULL WHERE id = :id"), {'id': recipe.id})
+    version = recipe.version
+
+    backfill_countries()
+    db.session.expire_all()
+
+    assert (recipe.country_code, recipe.version) == ('GH', version + 1)
+    backfill_countries()
+    db.session.expire_all()
+    assert recipe.version == version + 1
+
+def test_background_jobs_leave_edit_time_and_version_alone(recipe, user):
+    db.session.add(Rating(recipe_id=recipe.id, user_id=user.id, rating=4))
+    db.session.commit()
+    before = (recipe.version, recipe.updated_at)
+
+    rollup_trending(rebuild=True)
+    backfill_ingredients()
+    db.session.expire_all()
+
+    assert recipe.trending_score > 0
+    assert (recipe.version, recipe.updated_at) == before
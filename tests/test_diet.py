@@ -0,0 +1,78 @@
+import pytest
+from database import db
+from models import Recipe
+from diet import (name_flags, classify, excluded_flags, DIETS, MEAT, PORK, POULTRY, FISH, SHELLFISH, DAIRY,
+                  EGG, GLUTEN, PEANUT, TREE_NUT, SOY, SESAME, HONEY, ALCOHOL)
+
+@pytest.mark.parametrize('name, flags', [
+    ('basmati rice', 0),
+    ('chicken breast', POULTRY),
+    ('bacon', PORK | MEAT),
+    ('salmon fillet', FISH),
+    ('shrimp', SHELLFISH),
+    ('cheddar cheese', DAIRY),
+    ('egg', EGG),
+    ('all-purpose flour', GLUTEN),
+    ('beer', GLUTEN | ALCOHOL),
+    ('honey', HONEY),
+    ('tahini', SESAME),
+    # Phrases are matched before their words
+    ('coconut milk', 0),
+    ('almond milk', TREE_NUT),
+    ('peanut butter', PEANUT),
+    ('soy sauce', SOY | GLUTEN),
+    ('fish sauce', FISH),
+    ('rice flour', 0),
+    ('toasted sesame oil', SESAME),
+    # Free-from labels clear what they rule out, and only that
+    ('gluten-free pasta', 0),
+    ('vegan cheese', 0),
+    ('dairy-free chocolate', 0),
+    ('gluten-free beer', ALCOHOL),
+    ('plant-based honey', HONEY),
+])
+def test_name_flags(name, flags):
+    assert name_flags(name) == flags
+
+def test_classify_combines_ingredients():
+    assert classify([]) == 0
+    assert classify(['chicken', 'soy sauce', 'rice']) == POULTRY | SOY | GLUTEN
+    assert classify(['tofu', 'rice noodle']) == SOY
+
+def test_excluded_flags():
+    assert excluded_flags() == 0
+    assert excluded_flags(['vegan']) == DIETS['vegan']
+    assert excluded_flags(['pescatarian'], ['nut']) == MEAT | POULTRY | PEANUT | TREE_NUT
+    with pytest.raises(ValueError, match='Unknown diet'):
+        excluded_flags(['keto'])
+    with pytest.raises(ValueError, match='Unknown exclusion'):
+        excluded_flags([], ['nightshade'])
+
+def test_diet_flags_follow_ingredient_text(user):
+    recipe = Recipe(title='Stir-fry', ingredients='200g tofu\n2 tbsp soy sauce', instructions='Fry', user_id=user.id)
+    assert recipe.diet_flags == SOY | GLUTEN
+    recipe.ingredients = '200g tofu\n2 tbsp tamari'
+    assert recipe.diet_flags == SOY
+
+def test_diet_filter(client, user):
+    for title, ingredients in [
+        ('Chicken Curry', '500g chicken thighs\n1 cup coconut milk\n2 tbsp ghee'),
+        ('Dal', '1 cup red lentils\n1 can coconut milk'),
+        ('Pad Thai', '200g rice noodles\n2 eggs\n3 tbsp peanuts\n2 tbsp fish sauce'),
+        ('Fish Tacos', '400g cod\n8 corn tortillas'),
+    ]:
+        db.session.add(Recipe(title=title, ingredients=ingredients, instructions='Cook', user_id=user.id))
+    db.session.commit()
+
+    def titles(query):
+        response = client.get(f'/api/recipes?{query}')
+        assert response.status_code == 200
+        return sorted(r['title'] for r in response.get_json())
+
+    assert titles('diet=vegan') == ['Dal']
+    assert titles('diet=vegetarian') == ['Dal']
+    assert titles('diet=pescatarian') == ['Dal', 'Fish Tacos', 'Pad Thai']
+    assert titles('diet=gluten-free') == ['Chicken Curry', 'Dal', 'Fish Tacos', 'Pad Thai']
+    assert titles('diet=dairy-free&exclude=peanut') == ['Dal', 'Fish Tacos']
+    assert titles('exclude=fish') == ['Chicken Curry', 'Dal']
+    assert client.get('/api/recipes?diet=keto').status_code == 400
@@ -0,0 +1,79 @@
+from urllib.parse import urlencode
+import pytest
+from database import db
+from models import Recipe
+from cache import response_cache, LRUBackend
+
+RECIPES = [
+    # title, ingredients, country, prep, cook, rating_sum, rating_count
+    ('Jollof Rice', '3 cups rice\n400g tomato paste', 'Ghana', 10, 40, 9, 2),
+    ('Chicken Biryani', '2 cups basmati rice\n500g chicken thighs\n1 cup yogurt', 'India', 30, 60, 5, 1),
+    ('Dal', '1 cup red lentils\n1 can coconut milk', 'India', 5, 25, 7, 2),
+    ('Fish Tacos', '400g cod\n8 corn tortillas', 'Mexico', 10, 10, 3, 1),
+    ('Pancakes', '1 cup flour\n2 eggs\n1 cup milk', None, 5, 5, 0, 0),
+    ('Brisket', '2kg beef brisket', 'United States', 30, 300, 14, 3),
+]
+
+@pytest.fixture
+def recipes(user):
+    for title, ingredients, country, prep, cook, rating_sum, rating_count in RECIPES:
+        db.session.add(Recipe(
+            title=title, ingredients=ingredients, instructions='Cook', country=country, prep_time=prep,
+            cook_time=cook, rating_sum=rating_sum, rating_count=rating_count, user_id=user.id
+        ))
+    db.session.commit()
+
+@pytest.fixture
+def lru_cache():
+    response_cache.backend = LRUBackend()
+    yield response_cache
+    response_cache.backend = None
+
+def facets(client, query=''):
+    response = client.get(f'/api/recipes?facets=true&{query}')
+    assert response.status_code == 200
+    return response.get_json()['facets']
+
+def count(client, query):
+    response = client.get(f'/api/recipes?{query}')
+    assert response.status_code == 200
+    return len(response.get_json())
+
+@pytest.mark.parametrize('base', [{}, {'search': 'rice'}, {'country': 'India'}, {'diet': 'vegetarian'}])
+def test_every_count_is_what_adding_that_filter_returns(client, recipes, base):
+    def filtered(name, value):
+        args = dict(base)
+        # diet= takes one comma-separated list; the other filters take one value
+        args[name] = f'{args[name]},{value}' if name == 'diet' and name in args else value
+        return count(client, urlencode(args))
+
+    found = facets(client, urlencode(base))
+    for item in found['country']:
+        assert item['count'] == filtered('country', item['code'])
+    for item in found['diet']:
+        assert item['count'] == filtered('diet', item['diet'])
+    for item in found['total_time']:
+        assert item['count'] == filtered('max_total_time', item['max_total_time'])
+    for item in found['rating']:
+        assert item['count'] == filtered('min_rating', item['min_rating'])
+
+def test_counts(client, recipes):
+    found = facets(client)
+    assert found['country'][0] == {'code': 'IN', 'name': 'India', 'count': 2}
+    diets = {item['diet']: item['count'] for item in found['diet']}
+    assert (diets['vegan'], diets['vegetarian'], diets['gluten-free']) == (2, 3, 5)
+    times = {item['max_total_time']: item['count'] for item in found['total_time']}
+    assert times == {15: 1, 30: 3, 60: 4, 120: 5}
+    ratings = {item['min_rating']: item['count'] for item in found['rating']}
+    assert ratings == {4: 3, 3: 5, 2: 5, 1: 5}
+
+def test_facets_follow_the_search(client, recipes):
+    response = client.get('/api/recipes?search=rice&facets=true').get_json()
+    assert sorted(r['title'] for r in response['items']) == ['Chicken Biryani', 'Jollof Rice']
+    assert {item['code']: item['count'] for item in response['facets']['country']} == {'GH': 1, 'IN': 1}
+
+def test_cached_browse_counts_are_invalidated_by_a_rating(client, recipes, auth_headers, lru_cache):
+    assert {item['min_rating']: item['count'] for item in facets(client)['rating']}[1] == 5
+    pancakes = Recipe.query.filter_by(title='Pancakes').one()
+    assert client.post('/api/ratings', json={'recipe_id': pancakes.id, 'rating': 2}, headers=auth_headers).status_code == 201
+    assert {item['min_rating']: item['count'] for item in facets(client)['rating']}[1] == 6
@@ -0,0 +1,72 @@
+import pytest
+from sqlalchemy import select, func
+from database import db
+import fuzzy
+from fuzzy import trigrams, words, fuzzy_postings
+
+def similarity(a, b):
+    return len(trigrams(a) & trigrams(b)) / len(trigrams(a) | trigrams(b))
+
+def test_words_and_trigrams():
+    assert words("Côte d'Ivoire Chicken 2x") == ['cote', 'ivoire', 'chicken']
+    assert trigrams('rice') == {'  r', ' ri', 'ric', 'ice', 'ce '}
+    assert similarity('biryanni', 'biryani') == 0.7
+
+@pytest.fixture
+def recipes(client, auth_headers):
+    created = {}
+    for title, ingredients in [
+        ('Chicken Biryani', '2 cups basmati rice\n500g chicken thighs'),
+        ('Shakshuka', '6 eggs\n400g tomatoes'),
+        ('Jollof Rice', '3 cups rice\n400g tomato paste'),
+    ]:
+        response = client.post('/api/recipes', json={
+            'title': title, 'ingredients': ingredients, 'instructions': 'Cook'
+        }, headers=auth_headers)
+        assert response.status_code == 201
+        created[title] = response.get_json()['id']
+    return created
+
+def titles(client, q):
+    return [r['title'] for r in client.get(f'/api/recipes?search={q}').get_json()]
+
+@pytest.mark.parametrize('q, title', [
+    ('biryanni', 'Chicken Biryani'),
+    ('shakshouka', 'Shakshuka'),
+    ('jolof', 'Jollof Rice'),
+    ('chiken biryanni', 'Chicken Biryani'),
+])
+def test_typos_find_the_recipe(client, recipes, q, title):
+    assert titles(client, q) == [title]
+
+def test_ingredient_words_are_matched(client, recipes):
+    assert titles(client, 'basmatti') == ['Chicken Biryani']
+
+def test_threshold(client, recipes, monkeypatch):
+    assert similarity('riyani', 'biryani') < fuzzy.THRESHOLD <= similarity('birani', 'biryani')
+    assert titles(client, 'birani') == ['Chicken Biryani']
+    assert titles(client, 'riyani') == []
+    # The threshold is inclusive
+    monkeypatch.setattr(fuzzy, 'THRESHOLD', similarity('riyani', 'biryani'))
+    assert titles(client, 'riyani') == ['Chicken Biryani']
+
+def test_index_follows_updates(client, recipes, auth_headers):
+    recipe_id = recipes['Shakshuka']
+    response = client.put(f'/api/recipes/{recipe_id}', json={
+        'title': 'Menemen', 'ingredients': '6 eggs\n2 green peppers'
+    }, headers=auth_headers)
+    assert response.status_code == 200
+
+    assert titles(client, 'shakshouka') == []
+    assert titles(client, 'menemem') == ['Menemen']
+    assert titles(client, 'pepers') == ['Menemen']
+    assert titles(client, 'tomatos') == ['Jollof Rice']
+
+def test_index_follows_deletes(client, recipes, auth_headers):
+    recipe_id = recipes['Chicken Biryani']
+    assert client.delete(f'/api/recipes/{recipe_id}', headers=auth_headers).status_code == 200
+    assert titles(client, 'biryanni') == []
+    assert titles(client, 'basmatti') == []
+    # Postings of a deleted recipe would attach to whichever recipe reuses its id
+    postings = db.session.scalar(select(func.count()).where(fuzzy_postings.c.recipe_id == recipe_id))
+    assert postings == 0
@@ -0,0 +1,99 @@
+import pytest
+from database import db
+from models import Recipe
+from ingredients import parse_ingredient_line, parse_ingredients, parse_ingredient_query, head_word, name_words
+
+@pytest.mark.parametrize('line, quantity, unit, name', [
+    ('2 cups Basmati rice, rinsed', 2.0, 'cup', 'basmati rice'),
+    ('1 1/2 tbsp olive oil', 1.5, 'tbsp', 'olive oil'),
+    ('½ tsp salt', 0.5, 'tsp', 'salt'),
+    ('3-4 large tomatoes (about 500g)', 3.0, None, 'tomato'),
+    ('500g chicken thighs', 500.0, 'g', 'chicken thigh'),
+    ('Pinch of saffron', None, 'pinch', 'saffron'),
+    ('Salt to taste', None, None, 'salt'),
+    ('4 cloves', 4.0, None, 'clove'),
+    ('2 garlic cloves', 2.0, 'clove', 'garlic'),
+    ('3 cloves garlic, minced', 3.0, 'clove', 'garlic'),
+    ('1 head lettuce', 1.0, 'head', 'lettuce'),
+    ('1 head of garlic', 1.0, 'head', 'garlic'),
+    ('3 tbsp peanut butter', 3.0, 'tbsp', 'peanut butter'),
+    ('- 10 dried chilies', 10.0, None, 'chili'),
+])
+def test_parse_ingredient_line(line, quantity, unit, name):
+    item = parse_ingredient_line(line)
+    assert (item['quantity'], item['unit'], item['name']) == (quantity, unit, name)
+
+def test_blank_lines_are_skipped():
+    assert parse_ingredient_line('   ') is None
+    assert parse_ingredients('rice\n\n  \nbeans') == [
+        dict(parse_ingredient_line('rice')), dict(parse_ingredient_line('beans'))
+    ]
+
+def test_shared_line_is_split():
+    assert [item['name'] for item in parse_ingredients('Salt and pepper')] == ['salt', 'pepper']
+
+@pytest.mark.parametrize('name, head, words', [
+    ('basmati rice', 'rice', ['basmati', 'rice']),
+    ('chicken breast', 'chicken', ['chicken', 'breast']),
+    ('peanut butter', 'peanut butter', ['peanut']),
+    ('smooth peanut butter', 'peanut butter', ['smooth', 'peanut']),
+    ('butter', 'butter', ['butter']),
+])
+def test_head_and_words(name, head, words):
+    assert head_word(name) == head
+    assert name_words(name) == words
+
+@pytest.mark.parametrize('q, tree', [
+    ('rice', ('term', 'rice')),
+    ('sushi rice', ('term', 'sushi rice')),
+    ('chicken AND rice', ('and', ('term', 'chicken'), ('term', 'rice'))),
+    ('chicken rice', ('term', 'chicken rice')),
+    ('lamb OR beef', ('or', ('term', 'lamb'), ('term', 'beef'))),
+    ('NOT peanuts', ('not', ('term', 'peanut'))),
+    ('chicken NOT peanuts', ('and', ('term', 'chicken'), ('not', ('term', 'peanut')))),
+    ('(lamb OR beef) rice', ('and', ('or', ('term', 'lamb'), ('term', 'beef')), ('term', 'rice'))),
+    ('a OR b AND c', ('or', ('term', 'a'), ('and', ('term', 'b'), ('term', 'c')))),
+    ('not (lamb or beef)', ('not', ('or', ('term', 'lamb'), ('term', 'beef')))),
+])
+def test_query_grammar(q, tree):
+    assert parse_ingredient_query(q) == tree
+
+@pytest.mark.parametrize('q', ['', 'AND rice', 'rice AND', '(rice', 'rice)', 'NOT', '()'])
+def test_malformed_queries(q):
+    with pytest.raises(ValueError):
+        parse_ingredient_query(q)
+
+@pytest.fixture
+def recipes(user):
+    for title, ingredients in [
+        ('Satay', '500g chicken thighs\n3 tbsp peanut butter\n1 tbsp soy sauce'),
+        ('Garlic Rice', '2 cups basmati rice\n2 garlic cloves'),
+        ('Toast', '2 slices bread\n1 tbsp butter'),
+        ('Salad', '1 head lettuce\n2 tomatoes'),
+    ]:
+        db.session.add(Recipe(title=title, ingredients=ingredients, instructions='Cook', user_id=user.id))
+    db.session.commit()
+
+@pytest.mark.parametrize('q, titles', [
+    ('peanut', ['Satay']),
+    ('NOT peanuts', ['Garlic Rice', 'Salad', 'Toast']),
+    ('butter', ['Toast']),
+    ('peanut butter', ['Satay']),
+    ('garlic', ['Garlic Rice']),
+    ('lettuce', ['Salad']),
+    ('chicken', ['Satay']),
+    ('rice AND garlic', ['Garlic Rice']),
+    ('(bread OR lettuce) NOT tomato', ['Toast']),
+])
+def test_ingredient_filter(client, recipes, q, titles):
+    response = client.get('/api/recipes', query_string={'ingredient': q})
+    assert sorted(recipe['title'] for recipe in response.get_json()) == titles
+
+def test_malformed_query_is_a_400(client, recipes):
+    assert client.get('/api/recipes', query_string={'ingredient': '(rice'}).status_code == 400
+
+def test_edit_replaces_words(client, recipes):
+    recipe = Recipe.query.filter_by(title='Toast').one()
+    recipe.ingredients = '2 slices bread\n1 tbsp margarine'
+    db.session.commit()
+    assert client.get('/api/recipes', query_string={'ingredient': 'butter'}).get_json() == []
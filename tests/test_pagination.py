@@ -0,0 +1,59 @@
+from datetime import datetime
+import pytest
+from database import db
+from models import Recipe
+from utils import encode_cursor, decode_cursor, MAX_UNPAGINATED_ROWS
+
+def add_recipes(user, count):
+    db.session.execute(Recipe.__table__.insert(), [
+        {'title': f'Recipe {i:04d}', 'ingredients': 'rice', 'instructions': 'Cook', 'user_id': user.id,
+         'created_at': datetime(2024, 1, 1, 12, 0, i % 60)}
+        for i in range(count)
+    ])
+    db.session.commit()
+
+def test_cursor_round_trip():
+    keys = [Recipe.created_at, Recipe.id]
+    values = [datetime(2024, 5, 17, 8, 30, 15), 42]
+    token = encode_cursor(values)
+    assert '=' not in token
+    assert decode_cursor(token, keys) == values
+
+def test_cursor_keeps_null_and_text_values():
+    keys = [Recipe.title, Recipe.id]
+    assert decode_cursor(encode_cursor(['Jollof rice', 7]), keys) == ['Jollof rice', 7]
+    assert decode_cursor(encode_cursor([None, 7]), [Recipe.created_at, Recipe.id]) == [None, 7]
+
+@pytest.mark.parametrize('token', ['not-a-cursor', encode_cursor([1, 2, 3]), encode_cursor({'id': 1}), '!!!'])
+def test_bad_cursor_is_rejected(token):
+    with pytest.raises(ValueError):
+        decode_cursor(token, [Recipe.created_at, Recipe.id])
+
+def test_pages_cover_every_row_once(client, user):
+    add_recipes(user, 45)
+    seen = []
+    cursor = None
+    while True:
+        url = '/api/recipes?limit=20' + (f'&cursor={cursor}' if cursor else '')
+        page = client.get(url).get_json()
+        seen.extend(recipe['id'] for recipe in page['items'])
+        cursor = page['next_cursor']
+        if cursor is None:
+            break
+    assert len(seen) == len(set(seen)) == 45
+
+def test_invalid_cursor_is_a_400(client, user):
+    assert client.get('/api/recipes?cursor=garbage').status_code == 400
+
+def test_unpaginated_list_is_capped(client, user):
+    add_recipes(user, MAX_UNPAGINATED_ROWS + 5)
+    response = client.get('/api/recipes')
+    assert len(response.get_json()) == MAX_UNPAGINATED_ROWS
+    rest = client.get(f"/api/recipes?limit=100&cursor={response.headers['X-Next-Cursor']}").get_json()
+    assert len(rest['items']) == 5 and rest['next_cursor'] is None
+
+def test_short_unpaginated_list_has_no_cursor(client, user):
+    add_recipes(user, 3)
+    response = client.get('/api/recipes')
+    assert len(response.get_json()) == 3
+    assert 'X-Next-Cursor' not in response.headers
@@ -0,0 +1,98 @@
+import time
+import pytest
+from database import db
+from models import Recipe
+from pantry import pantry_index
+
+def add_recipes(user, *recipes):
+    added = [Recipe(title=title, ingredients=ingredients, instructions='Cook', user_id=user.id) for title, ingredients in recipes]
+    db.session.add_all(added)
+    db.session.commit()
+    return added
+
+def titles(client, query):
+    response = client.get(f'/api/recipes/pantry?{query}')
+    assert response.status_code == 200
+    return [r['title'] for r in response.get_json()]
+
+@pytest.fixture
+def create(client, auth_headers):
+    def create(title, ingredients):
+        response = client.post('/api/recipes', json={
+            'title': title, 'ingredients': ingredients, 'instructions': 'Cook'
+        }, headers=auth_headers)
+        assert response.status_code == 201
+        return response.get_json()['id']
+    return create
+
+def test_ranked_by_fewest_missing_then_most_matched(client, create):
+    create('Rice and Beans', '2 cups rice\n1 can black beans')
+    create('Chicken Rice', '2 cups rice\n500g chicken\n1 onion')
+    create('Plain Rice', '1 cup rice')
+    create('Pasta', '200g pasta')
+
+    response = client.get('/api/recipes/pantry?ingredients=Rice, beans')
+    assert [(r['title'], r['matched'], r['missing'], r['missing_ingredients']) for r in response.get_json()] == [
+        ('Rice and Beans', 2, 0, []),
+        ('Plain Rice', 1, 0, []),
+        ('Chicken Rice', 1, 2, ['chicken', 'onion']),
+    ]
+    assert titles(client, 'ingredients=rice,beans&max_missing=0') == ['Rice and Beans', 'Plain Rice']
+    assert titles(client, 'ingredients=rice,beans&limit=1') == ['Rice and Beans']
+
+def test_staples_never_count(client, create):
+    create('Boiled Rice', '1 cup rice\n2 cups water\nSalt to taste')
+    response = client.get('/api/recipes/pantry?ingredients=rice').get_json()
+    assert (response[0]['matched'], response[0]['missing']) == (1, 0)
+    # ...and don't match a recipe on their own
+    assert titles(client, 'ingredients=salt,water') == []
+
+def test_item_covers_ingredients_with_that_head_word(client, create):
+    create('Biryani', '2 cups basmati rice\n500g chicken thighs')
+    create('Plain Rice', '1 cup rice')
+
+    assert titles(client, 'ingredients=rice,chicken&max_missing=0') == ['Biryani', 'Plain Rice']
+    # A specific name doesn't cover the general one
+    assert titles(client, 'ingredients=basmati rice') == ['Biryani']
+
+def test_edits_and_deletes_reach_the_index(client, create, auth_headers):
+    recipe_id = create('Rice and Beans', '2 cups rice\n1 can black beans')
+    create('Plain Rice', '1 cup rice')
+
+    client.put(f'/api/recipes/{recipe_id}', json={'ingredients': '2 cups rice\n2 eggs'}, headers=auth_headers)
+    assert titles(client, 'ingredients=beans') == []
+    assert titles(client, 'ingredients=eggs') == ['Rice and Beans']
+
+    assert client.delete(f'/api/recipes/{recipe_id}', headers=auth_headers).status_code == 200
+    assert titles(client, 'ingredients=rice,eggs') == ['Plain Rice']
+
+def test_pantry_is_required_and_bounded(client):
+    assert client.get('/api/recipes/pantry').status_code == 400
+    assert client.get('/api/recipes/pantry?ingredients=' + ','.join(['rice'] * 101)).status_code == 400
+
+def test_seeded_recipes_are_ranked(client):
+    assert client.post('/api/seed-recipes').status_code == 200
+    assert titles(client, 'ingredients=rice,lentils,pasta')[0] == 'Koshari'
+
+def test_recipes_deleted_elsewhere_are_replaced(client, user):
+    add_recipes(user, ('Plain Rice', 'rice'), ('Rice and Beans', 'rice\nbeans'), ('Fried Rice', 'rice\negg\npeas'))
+    pantry_index.rebuild()
+    # As if another worker deleted it: the database has no row, this index still does
+    Recipe.query.filter_by(title='Plain Rice').delete()
+    db.session.commit()
+
+    assert titles(client, 'ingredients=rice&limit=2') == ['Rice and Beans', 'Fried Rice']
+
+def test_stale_index_picks_up_other_workers_recipes(client, user, app):
+    add_recipes(user, ('Plain Rice', 'rice'))
+    assert titles(client, 'ingredients=rice') == []
+
+    app.config['PANTRY_REFRESH_SECONDS'] = 1
+    try:
+        pantry_index._built_at -= 2
+        deadline = time.monotonic() + 5
+        while not titles(client, 'ingredients=rice') and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert titles(client, 'ingredients=rice') == ['Plain Rice']
+    finally:
+        app.config['PANTRY_REFRESH_SECONDS'] = 600
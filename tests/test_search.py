@@ -0,0 +1,19 @@
+from sqlalchemy import text
+from database import db
+from models import Recipe
+from search import init_search_index
+
+def test_index_created_on_existing_data_is_filled(client, user, auth_headers):
+    recipe = Recipe(title='Jollof Rice', ingredients='2 cups rice', instructions='Cook', user_id=user.id)
+    db.session.add(recipe)
+    db.session.commit()
+    # As on a database that predates the search index
+    with db.engine.begin() as conn:
+        for name in ('recipes_fts_insert', 'recipes_fts_delete', 'recipes_fts_update'):
+            conn.execute(text(f"DROP TRIGGER {name}"))
+        conn.execute(text("DROP TABLE recipes_fts"))
+    init_search_index()
+
+    assert [r['title'] for r in client.get('/api/recipes?search=jollof').get_json()] == ['Jollof Rice']
+    assert client.put(f'/api/recipes/{recipe.id}', json={'title': 'Jollof'}, headers=auth_headers).status_code == 200
+    assert client.delete(f'/api/recipes/{recipe.id}', headers=auth_headers).status_code == 200
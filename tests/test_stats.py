@@ -0,0 +1,74 @@
+import pytest
+from flask_jwt_extended import create_access_token
+from database import db
+from models import Recipe, User
+
+@pytest.fixture
+def recipe(user):
+    recipe = Recipe(title='Jollof Rice', ingredients='rice', instructions='Cook', user_id=user.id)
+    db.session.add(recipe)
+    db.session.commit()
+    return recipe
+
+@pytest.fixture
+def other_headers(app):
+    other = User(username='taster', email='taster@example.com')
+    other.set_password('secret')
+    db.session.add(other)
+    db.session.commit()
+    return {'Authorization': f'Bearer {create_access_token(identity=str(other.id))}'}
+
+def stats(recipe):
+    db.session.expire_all()
+    return recipe.rating_sum, recipe.rating_count, recipe.comment_count
+
+def assert_bayes(recipe):
+    expected = (Recipe.PRIOR_WEIGHT * Recipe.PRIOR_MEAN + recipe.rating_sum) / (Recipe.PRIOR_WEIGHT + recipe.rating_count)
+    assert recipe.bayes_score == pytest.approx(expected)
+
+def rate(client, recipe, rating, headers):
+    return client.post('/api/ratings', json={'recipe_id': recipe.id, 'rating': rating}, headers=headers)
+
+def test_rating_create_update_and_delete_move_the_counters(client, recipe, auth_headers, other_headers):
+    assert rate(client, recipe, 4, auth_headers).status_code == 201
+    assert stats(recipe) == (4, 1, 0)
+    assert_bayes(recipe)
+
+    assert rate(client, recipe, 2, other_headers).status_code == 201
+    assert stats(recipe) == (6, 2, 0)
+    assert_bayes(recipe)
+
+    # Re-rating moves the sum by the difference and leaves the count alone
+    response = rate(client, recipe, 5, auth_headers)
+    assert response.status_code == 200
+    assert stats(recipe) == (7, 2, 0)
+    assert_bayes(recipe)
+
+    assert client.delete(f"/api/ratings/{response.get_json()['id']}", headers=auth_headers).status_code == 200
+    assert stats(recipe) == (2, 1, 0)
+    assert_bayes(recipe)
+
+    data = client.get(f'/api/recipes/{recipe.id}').get_json()
+    assert (data['avg_rating'], data['rating_count']) == (2.0, 1)
+
+def test_rejected_ratings_leave_the_counters_alone(client, recipe, auth_headers, other_headers):
+    response = rate(client, recipe, 4, auth_headers)
+    assert rate(client, recipe, 6, auth_headers).status_code == 400
+    assert client.delete(f"/api/ratings/{response.get_json()['id']}", headers=other_headers).status_code == 403
+    assert stats(recipe) == (4, 1, 0)
+
+def test_comment_create_and_delete_move_the_count(client, recipe, auth_headers):
+    ids = []
+    for content in ('Lovely', 'Made it twice'):
+        response = client.post('/api/comments', json={'recipe_id': recipe.id, 'content': content}, headers=auth_headers)
+        assert response.status_code == 201
+        ids.append(response.get_json()['id'])
+    assert stats(recipe) == (0, 0, 2)
+
+    # Editing a comment changes no counter
+    assert client.put(f'/api/comments/{ids[0]}', json={'content': 'Lovely!'}, headers=auth_headers).status_code == 200
+    assert stats(recipe) == (0, 0, 2)
+
+    assert client.delete(f'/api/comments/{ids[0]}', headers=auth_headers).status_code == 200
+    assert stats(recipe) == (0, 0, 1)
+    assert client.get(f'/api/recipes/{recipe.id}').get_json()['comment_count'] == 1
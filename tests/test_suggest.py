@@ -0,0 +1,34 @@
+import time
+from database import db
+from models import Recipe
+from suggest import suggest_index
+
+def suggested(client, q, kind='recipe'):
+    return [s['text'] for s in client.get(f'/api/recipes/suggest?q={q}').get_json() if s['type'] == kind]
+
+def test_seeded_recipes_are_indexed(client):
+    assert client.post('/api/seed-recipes').status_code == 200
+
+    assert 'Kung Pao Chicken' in suggested(client, 'kung')
+    assert [r['title'] for r in client.get('/api/recipes?search=stroganof').get_json()] == ['Beef Stroganoff']
+
+def test_stale_index_reloads_popularity(client, user, app):
+    for title in ('Chicken Curry', 'Chicken Soup'):
+        recipe = Recipe(title=title, ingredients='1 chicken', instructions='Cook', user_id=user.id)
+        db.session.add(recipe)
+        db.session.commit()
+        suggest_index.add_recipe(recipe)
+    # A rating only changes the counters; the index sees it at the next refresh
+    Recipe.query.filter_by(title='Chicken Soup').update({Recipe.rating_count: 5})
+    db.session.commit()
+    assert suggested(client, 'chicken')[0] == 'Chicken Curry'
+
+    app.config['SUGGEST_REFRESH_SECONDS'] = 1
+    try:
+        suggest_index._built_at -= 2
+        deadline = time.monotonic() + 5
+        while suggested(client, 'chicken')[0] != 'Chicken Soup' and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert suggested(client, 'chicken')[0] == 'Chicken Soup'
+    finally:
+        app.config['SUGGEST_REFRESH_SECONDS'] = 600
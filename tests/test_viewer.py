@@ -0,0 +1,30 @@
+from datetime import timedelta
+import pytest
+from flask_jwt_extended import create_access_token
+from database import db
+from models import Recipe, Bookmark
+
+@pytest.fixture
+def bookmarked(user):
+    recipe = Recipe(title='Jollof Rice', ingredients='2 cups rice', instructions='Cook', user_id=user.id)
+    db.session.add(recipe)
+    db.session.flush()
+    db.session.add(Bookmark(user_id=user.id, recipe_id=recipe.id))
+    db.session.commit()
+    return recipe
+
+@pytest.mark.parametrize('path', ['/api/recipes', '/api/recipes/user/{user_id}'])
+def test_signed_in_viewer_gets_their_state(client, user, auth_headers, bookmarked, path):
+    response = client.get(path.format(user_id=user.id), headers=auth_headers)
+    assert response.status_code == 200
+    assert response.get_json()[0]['is_bookmarked'] is True
+
+@pytest.mark.parametrize('path', ['/api/recipes', '/api/recipes/user/{user_id}'])
+@pytest.mark.parametrize('token', ['expired', 'garbage'])
+def test_stale_token_is_treated_as_anonymous(client, user, bookmarked, path, token):
+    if token == 'expired':
+        token = create_access_token(identity=str(user.id), expires_delta=timedelta(seconds=-1))
+    response = client.get(path.format(user_id=user.id), headers={'Authorization': f'Bearer {token}'})
+    assert response.status_code == 200
+    assert [r['title'] for r in response.get_json()] == ['Jollof Rice']
+    assert 'is_bookmarked' not in response.get_json()[0]
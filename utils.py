@@ -0,0 +1,209 @@
+import base64
+import json
+from datetime import datetime
+from functools import wraps
+from itertools import islice
+from flask import request, jsonify, make_response, Response, current_app, stream_with_context, g
+from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+from flask_jwt_extended.exceptions import JWTExtendedException
+from jwt import InvalidTokenError
+from sqlalchemy import and_, or_, DateTime
+from database import db
+from models import Bookmark, Rating, Recipe
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+# Clients that don't paginate still get a plain list, but never more than this
+MAX_UNPAGINATED_ROWS = 500
+STREAM_BATCH_SIZE = 500
+
+def encode_cursor(values):
+    """Pack the sort key values of the last row on a page into an opaque token"""
+    values = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    payload = json.dumps(values, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip('=')
+
+def decode_cursor(token, keys):
+    """Unpack a cursor token back into values matching the given sort keys"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(values, list) or len(values) != len(keys):
+            raise ValueError
+        return [
+            datetime.fromisoformat(value) if isinstance(key.type, DateTime) and value is not None else value
+            for key, value in zip(keys, values)
+        ]
+    except (ValueError, TypeError):
+        raise ValueError('Invalid cursor')
+
+def is_paginated():
+    return 'limit' in request.args or 'cursor' in request.args
+
+def get_page_limit():
+    limit = request.args.get('limit', DEFAULT_PAGE_SIZE, type=int)
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+def _after(keys, values, descending):
+    # Row-value comparison (k1, k2, ...) > (v1, v2, ...) spelled out so it
+    # works on every backend and can still use a composite index
+    clauses = []
+    for i, key in enumerate(keys):
+        equal_prefix = [keys[j] == values[j] for j in range(i)]
+        clauses.append(and_(*equal_prefix, key < values[i] if descending else key > values[i]))
+    return or_(*clauses)
+
+def paginate(query, keys, key, descending=False):
+    """Order query by keys and fetch one keyset page of it.
+
+    keys must end with a unique column (usually the primary key) and key(row)
+    must return the values of those keys for a result row. Returns the rows
+    and the cursor for the next page, or None on the last page. Clients that
+    send neither limit nor cursor get the first MAX_UNPAGINATED_ROWS rows.
+    """
+    query = query.order_by(*[k.desc() if descending else k.asc() for k in keys])
+    limit = get_page_limit() if is_paginated() else MAX_UNPAGINATED_ROWS
+    cursor = request.args.get('cursor')
+    if cursor:
+        query = query.filter(_after(keys, decode_cursor(cursor, keys), descending))
+
+    # One extra row tells us whether there is another page without a COUNT
+    rows = query.limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(key(rows[-1]))
+    return rows, next_cursor
+
+def page_response(items, next_cursor, **extra):
+    """Plain list for unpaginated requests, items + next_cursor (+ any extra keys) otherwise or when extra is given.
+
+    A plain list cut short at MAX_UNPAGINATED_ROWS carries the cursor for the
+    rest in an X-Next-Cursor header.
+    """
+    if not is_paginated() and not extra:
+        response = jsonify(items)
+        if next_cursor:
+            response.headers['X-Next-Cursor'] = next_cursor
+        return response
+    return jsonify({'items': items, 'next_cursor': next_cursor, **extra})
+
+def is_streaming():
+    return request.args.get('stream') in ('ndjson', 'json')
+
+def stream_response(query, keys, descending, serialize):
+    """Stream every row of query, in key order, as NDJSON (?stream=ndjson) or a chunked JSON array (?stream=json).
+
+    Rows come off a server-side cursor STREAM_BATCH_SIZE at a time and
+    serialize(rows) turns each batch into dicts, so memory stays flat and the
+    first bytes go out before the last row is read. limit and cursor are ignored.
+    """
+    ndjson = request.args.get('stream') == 'ndjson'
+    query = query.order_by(*[k.desc() if descending else k.asc() for k in keys]).yield_per(STREAM_BATCH_SIZE)
+    dumps = current_app.json.dumps
+    
+    def generate():
+        rows = iter(query)
+        first = True
+        if not ndjson:
+            yield '['
+        while True:
+            batch = list(islice(rows, STREAM_BATCH_SIZE))
+            if not batch:
+                break
+            for item in serialize(batch):
+                if ndjson:
+                    yield dumps(item) + '\n'
+                else:
+                    yield ('' if first else ',') + dumps(item)
+                first = False
+        if not ndjson:
+            yield ']'
+    
+    mimetype = 'application/x-ndjson' if ndjson else 'application/json'
+    return Response(stream_with_context(generate()), mimetype=mimetype)
+
+def get_recipe_fields():
+    """Fields requested with ?fields=summary or ?fields=title,image_url,... (None means everything)"""
+    fields = request.args.get('fields', '').strip()
+    if not fields:
+        return None
+    if fields == 'summary':
+        return Recipe.SUMMARY_FIELDS
+    return {field.strip() for field in fields.split(',') if field.strip()}
+
+def get_viewer_id():
+    """The signed-in user's id, or None for anonymous viewers.
+
+    For public routes: an expired or malformed token (a stale one a frontend
+    kept in storage) counts as anonymous instead of failing the request.
+    """
+    try:
+        verify_jwt_in_request(optional=True)
+    except (JWTExtendedException, InvalidTokenError):
+        return None
+    identity = get_jwt_identity()
+    return int(identity) if identity is not None else None
+
+def attach_viewer_state(recipes_data, user_id):
+    """Add is_bookmarked and my_rating to serialized recipes for one viewer.
+
+    Costs two IN queries for the whole page, both served by the
+    (user_id, recipe_id) unique indexes. Anonymous viewers get nothing added.
+    """
+    if user_id is None or not recipes_data:
+        return recipes_data
+    
+    recipe_ids = [recipe['id'] for recipe in recipes_data]
+    bookmarked = {
+        recipe_id for recipe_id, in db.session.query(Bookmark.recipe_id).filter(
+            Bookmark.user_id == user_id, Bookmark.recipe_id.in_(recipe_ids)
+        )
+    }
+    my_ratings = dict(db.session.query(Rating.recipe_id, Rating.rating).filter(
+        Rating.user_id == user_id, Rating.recipe_id.in_(recipe_ids)
+    ))
+    
+    for recipe in recipes_data:
+        recipe['is_bookmarked'] = recipe['id'] in bookmarked
+        recipe['my_rating'] = my_ratings.get(recipe['id'])
+    return recipes_data
+
+def conditional(validators):
+    """Answer If-None-Match / If-Modified-Since with a 304 before running the view.
+
+    validators(**view_args) must return (etag, last_modified) from a cheap
+    lookup (a version column, not the full resource), or None to let the
+    view handle a missing resource. Successful responses get strong ETag and
+    Last-Modified headers. The ETag is also left in g.etag, where
+    response_cache folds it into its key so a cached body is only ever sent
+    with the version it was rendered from.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            found = validators(**kwargs)
+            if found is None:
+                return view(*args, **kwargs)
+            etag, last_modified = found
+            g.etag = etag
+            
+            if request.if_none_match:
+                not_modified = request.if_none_match.contains(etag)
+            else:
+                since = request.if_modified_since
+                not_modified = bool(since and last_modified and
+                                    last_modified.replace(microsecond=0) <= since.replace(tzinfo=None))
+            if not_modified:
+                response = Response(status=304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            
+            response.set_etag(etag)
+            if last_modified:
+                response.last_modified = last_modified
+            return response
+        return wrapper
+    return decorator